@@ -0,0 +1,36 @@
+"""Compare two benchmark result files written by benchmarks.run
+
+Usage: python -m benchmarks.compare before.json after.json
+"""
+
+import argparse
+import json
+
+
+def load(path: str) -> tuple[dict, dict]:
+    with open(path) as file:
+        report = json.load(file)
+    return report, {
+        (result["case"], result["rows"]): result["min"] for result in report["results"]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("before")
+    parser.add_argument("after")
+    args = parser.parse_args()
+
+    before_report, before = load(args.before)
+    after_report, after = load(args.after)
+    print(f"{before_report['commit']} -> {after_report['commit']}")
+
+    for case, rows in sorted(before.keys() & after.keys(), key=lambda key: key[::-1]):
+        ratio = after[case, rows] / before[case, rows]
+        print(
+            f"{rows:>10} {case:<60} {before[case, rows] * 1000:10.2f}ms {after[case, rows] * 1000:10.2f}ms {ratio:6.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+import psycopg
+
+from personal_dashboard.backend.database import YONDER, SqlConnections
+
+
+def prepare_schema(conn: psycopg.Connection, schema: str):
+    """Create empty transaction tables in a throwaway schema and switch to it"""
+    conn.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+    conn.execute(f"CREATE SCHEMA {schema}")
+    conn.execute(f"SET search_path TO {schema}")
+    conn.execute(
+        f"""CREATE TABLE {YONDER} (
+            transaction_time timestamp PRIMARY KEY,
+            description text,
+            amount_gbp double precision,
+            amount_ccy double precision,
+            currency text,
+            category text,
+            debit_or_credit text,
+            postcode text
+        )"""
+    )
+    SqlConnections.ensure_schema(conn)
+
+
+def drop_schema(conn: psycopg.Connection, schema: str):
+    conn.execute(f"DROP SCHEMA {schema} CASCADE")
+    conn.commit()
@@ -0,0 +1,93 @@
+"""Compare fetchall-to-DataFrame with the COPY-based typed fetch
+
+Usage: BENCHMARK_DATABASE_URL=postgresql://localhost/postgres python -m benchmarks.fetch
+"""
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import pandas as pd
+import psycopg
+from loguru import logger
+
+from benchmarks.database import drop_schema, prepare_schema
+from benchmarks.synthetic import generate_yonder_rows
+from personal_dashboard.backend.database import (
+    YONDER,
+    SqlConnections,
+    parse_transaction_rows,
+)
+
+BENCHMARK_SCHEMA = "benchmark_fetch"
+
+
+def fetchall_to_frame(conn: psycopg.Connection) -> pd.DataFrame:
+    """The previous fetch path, including the re-parse done by the dashboard"""
+    with conn.cursor() as cur:
+        cur.execute(f"SELECT * FROM {YONDER}")
+        rows = cur.fetchall()
+        colnames = [desc[0] for desc in cur.description]
+        df = pd.DataFrame(rows, columns=colnames)
+
+    df.loc[:, "transaction_time"] = pd.to_datetime(df["transaction_time"])
+    df.set_index("transaction_time", inplace=True)
+    return df
+
+
+def measure(label: str, func, conn: psycopg.Connection):
+    # Wall time and memory are measured in separate runs as tracemalloc slows
+    # down allocation-heavy code
+    start = time.perf_counter()
+    func(conn)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    df = func(conn)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    frame_size = df.memory_usage(deep=True).sum()
+    print(
+        f"{label:<24} {elapsed:8.2f}s  peak {peak / 2**20:8.1f} MiB  frame {frame_size / 2**20:8.1f} MiB"
+    )
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--dsn", default=os.getenv("BENCHMARK_DATABASE_URL", "postgresql://localhost")
+    )
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    with psycopg.connect(args.dsn) as conn:
+        prepare_schema(conn, BENCHMARK_SCHEMA)
+        SqlConnections.bulk_upsert_transactions(
+            conn, parse_transaction_rows(generate_yonder_rows(args.rows, args.seed))
+        )
+        print(f"{args.rows} synthetic rows, schema {BENCHMARK_SCHEMA}")
+
+        legacy_time, legacy_peak = measure(
+            "fetchall + to_datetime", fetchall_to_frame, conn
+        )
+        copy_time, copy_peak = measure(
+            "COPY typed columns", SqlConnections.get_all_transactions_as_table, conn
+        )
+
+        drop_schema(conn, BENCHMARK_SCHEMA)
+
+    print(
+        f"COPY vs fetchall: {copy_time / legacy_time:.2f}x wall time, {copy_peak / legacy_peak:.2f}x peak memory"
+    )
+
+
+if __name__ == "__main__":
+    main()
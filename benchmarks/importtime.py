@@ -0,0 +1,85 @@
+"""Guard the cold-start import cost of the functions in the webhook image
+
+Usage: python -m benchmarks.importtime --max-ms 500
+
+Imports the Telegram webhook and reporting modules in fresh interpreters with
+-X importtime and fails when a dashboard-only module is pulled in, or when the
+median import time exceeds the budget. Budgets are machine dependent, so
+compare like with like.
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+
+MODULES = [
+    "personal_dashboard.telegram_webhook",
+    "personal_dashboard.telegram_webhook_async",
+    "personal_dashboard.reporting",
+]
+# Top-level packages only the dashboard may import
+FORBIDDEN = {
+    "numpy",
+    "pandas",
+    "plotly",
+    "streamlit",
+    "streamlit_authenticator",
+    "matplotlib",
+    "langchain_community",
+    "telegram",
+}
+
+
+def import_profile(module: str) -> tuple[float, dict[str, int]]:
+    """Import module in a new interpreter
+
+    :return (seconds, imported): Total import time and microseconds per module
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    imported = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, _, name = line.removeprefix("import time:").split("|")
+        imported[name.strip()] = int(self_us)
+    return sum(imported.values()) / 1e6, imported
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--max-ms", type=float, default=500)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    failed = False
+    for module in MODULES:
+        profiles = [import_profile(module) for _ in range(args.repeat)]
+        seconds = statistics.median(total for total, _ in profiles)
+        imported = profiles[-1][1]
+
+        forbidden = sorted(
+            {name.split(".")[0] for name in imported} & FORBIDDEN, key=str.lower
+        )
+        slowest = sorted(imported.items(), key=lambda item: item[1], reverse=True)
+        print(f"{module:<45} {seconds * 1000:8.1f}ms {len(imported):5} modules")
+        for name, self_us in slowest[:5]:
+            print(f"    {name:<41} {self_us / 1000:8.1f}ms")
+
+        if forbidden:
+            print(f"FAIL {module} imports {', '.join(forbidden)}")
+            failed = True
+        if seconds * 1000 > args.max_ms:
+            print(f"FAIL {module} takes more than {args.max_ms}ms to import")
+            failed = True
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Compare the per-row and bulk ingest paths against a local Postgres
+
+Usage: BENCHMARK_DATABASE_URL=postgresql://localhost/postgres python -m benchmarks.ingest
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import psycopg
+from loguru import logger
+
+from benchmarks.database import drop_schema, prepare_schema
+from benchmarks.synthetic import generate_yonder_rows
+from personal_dashboard.backend.database import (
+    YONDER,
+    YONDER_ROLLUPS,
+    SqlConnections,
+    parse_transaction_rows,
+)
+
+BENCHMARK_SCHEMA = "benchmark_ingest"
+
+
+def truncate(conn: psycopg.Connection):
+    conn.execute(f"TRUNCATE {YONDER}, {YONDER_ROLLUPS}")
+    conn.commit()
+
+
+def timed(label: str, func, *args) -> float:
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<32} {elapsed:8.2f}s  {result if result is not None else ''}")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--dsn", default=os.getenv("BENCHMARK_DATABASE_URL", "postgresql://localhost")
+    )
+    args = parser.parse_args()
+
+    # The per-row path logs every row at debug level
+    logger.remove()
+    logger.add(sys.stderr, level="INFO")
+
+    csv_rows = generate_yonder_rows(args.rows, args.seed)
+    print(f"{args.rows} synthetic rows, schema {BENCHMARK_SCHEMA}")
+
+    with psycopg.connect(args.dsn) as conn:
+        prepare_schema(conn, BENCHMARK_SCHEMA)
+
+        per_row = timed(
+            "per-row upsert_transaction",
+            SqlConnections.upsert_transaction,
+            conn,
+            csv_rows,
+        )
+        truncate(conn)
+
+        copy = timed(
+            "bulk COPY",
+            SqlConnections.bulk_upsert_transactions,
+            conn,
+            parse_transaction_rows(csv_rows),
+        )
+        truncate(conn)
+
+        executemany = timed(
+            "bulk executemany",
+            SqlConnections.bulk_upsert_transactions,
+            conn,
+            parse_transaction_rows(csv_rows),
+            False,
+        )
+
+        # Everything is already present: measures the cost of a full re-upload
+        timed(
+            "bulk COPY re-upload",
+            SqlConnections.bulk_upsert_transactions,
+            conn,
+            parse_transaction_rows(csv_rows),
+        )
+
+        drop_schema(conn, BENCHMARK_SCHEMA)
+
+    print(f"COPY speed-up over per-row: {per_row / copy:.1f}x")
+    print(f"executemany speed-up over per-row: {per_row / executemany:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Measure the memory held by the cached transactions frame and by each session
+
+Usage: python -m benchmarks.memory --rows 1000000 --sessions 10
+
+Compares the frame under the original all-object schema, the previous schema
+with categorical columns only, and YONDER_DTYPES. Then compares what N sessions
+keep alive when each builds its own AnalyticsView from the shared frame against
+sharing one view, as the dashboard does.
+"""
+
+import argparse
+import gc
+import sys
+import tracemalloc
+
+import pandas as pd
+from loguru import logger
+
+from benchmarks.synthetic import generate_transactions
+from personal_dashboard.backend.analytics_service import AnalyticsService
+from personal_dashboard.backend.database import YONDER_DTYPES
+from personal_dashboard.frontend.page_components import PageComponents
+
+SCHEMAS = {
+    "object": {column: "object" for column, dtype in YONDER_DTYPES.items()}
+    | {"amount_gbp": "float64", "amount_ccy": "float64"},
+    "categorical": YONDER_DTYPES | {"description": "object", "postcode": "object"},
+    "compact": YONDER_DTYPES,
+}
+
+
+def frame_size(df: pd.DataFrame) -> int:
+    return int(df.memory_usage(deep=True).sum())
+
+
+def retained_by_sessions(df: pd.DataFrame, sessions: int, shared: bool) -> int:
+    """Bytes kept alive by the PageComponents of concurrent sessions"""
+    view = AnalyticsService.build_view(df, exclude_holiday=True) if shared else None
+
+    gc.collect()
+    tracemalloc.start()
+    components = [
+        PageComponents(
+            view or AnalyticsService.build_view(df, exclude_holiday=True),
+            exclude_holiday=True,
+        )
+        for _ in range(sessions)
+    ]
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del components, view
+    return retained
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--sessions", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    df = generate_transactions(args.rows, args.seed)
+
+    print(f"Frame of {args.rows} transactions")
+    sizes = {}
+    for name, dtypes in SCHEMAS.items():
+        sizes[name] = frame_size(df.astype(dtypes))
+        print(
+            f"    {name:<12} {sizes[name] / 2**20:10.1f} MiB {sizes[name] / sizes['object']:6.2f}x"
+        )
+
+    compact = df.astype(YONDER_DTYPES)
+    print(f"Retained by {args.sessions} sessions excluding holidays")
+    for label, shared in (("per-session", False), ("shared", True)):
+        retained = retained_by_sessions(compact, args.sessions, shared)
+        print(f"    {label:<12} {retained / 2**20:10.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
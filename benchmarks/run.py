@@ -0,0 +1,173 @@
+"""Time the dashboard's analysis, figure and CSV parsing paths on synthetic data
+
+Usage: python -m benchmarks.run --sizes 1000 100000 10000000 --output results.json
+
+No browser or database is needed. Results are written as JSON so that runs from
+different commits can be compared with benchmarks.compare.
+"""
+
+import argparse
+import collections
+import csv
+import io
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime as dt
+from functools import partial
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from benchmarks.synthetic import generate_transactions, to_yonder_rows
+from personal_dashboard.backend.analytics_service import ROLLUP_FREQUENCIES
+from personal_dashboard.backend.database import parse_transaction_rows
+from personal_dashboard.backend.financial_analysis import (
+    SpendingAnalysis,
+    TransactionPeriod,
+)
+from personal_dashboard.backend.period_precompute import precompute_period_views
+from personal_dashboard.backend.search_index import DescriptionIndex
+from personal_dashboard.frontend.figures import Figures
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+# Formatting the CSV text of larger histories takes several GB
+CSV_MAX_ROWS = 1_000_000
+
+
+def with_fresh_period(df: pd.DataFrame, method: str, *args):
+    """Call a TransactionPeriod method so that building its cached keys is timed"""
+    return getattr(TransactionPeriod(df), method)(*args)
+
+
+def parse_csv(csv_text: str):
+    collections.deque(parse_transaction_rows(csv.reader(io.StringIO(csv_text))), 0)
+
+
+def benchmark_cases(df: pd.DataFrame) -> dict:
+    """Name -> zero-argument callable for every timed path"""
+    last_month = df.index[-1].strftime("%Y-%m")
+    last_week = df.index[-1].isocalendar()
+    month_df = TransactionPeriod(df).get_month_df(last_month)
+    category_spending_each_month_df = TransactionPeriod(
+        df
+    ).get_periodic_category_spending_df("MS")
+
+    cases = {
+        "TransactionPeriod.get_month_df": partial(
+            with_fresh_period, df, "get_month_df", last_month
+        ),
+        "TransactionPeriod.get_week_df": partial(
+            with_fresh_period, df, "get_week_df", last_week.year, last_week.week
+        ),
+        "TransactionPeriod.get_periodic_category_spending_df[MS]": partial(
+            with_fresh_period, df, "get_periodic_category_spending_df", "MS"
+        ),
+        "TransactionPeriod.get_category_spending_by_period[week]": partial(
+            with_fresh_period,
+            df,
+            "get_category_spending_by_period",
+            ROLLUP_FREQUENCIES["week"],
+        ),
+        "SpendingAnalysis.get_period_stats[M]": partial(
+            SpendingAnalysis.get_period_stats, df, "M"
+        ),
+        "SpendingAnalysis.get_period_stats[W]": partial(
+            SpendingAnalysis.get_period_stats, df, "W"
+        ),
+        "SpendingAnalysis.get_average_expense[ME]": partial(
+            SpendingAnalysis.get_average_expense, df, "ME"
+        ),
+        "SpendingAnalysis.get_top_expense_categories[month]": partial(
+            SpendingAnalysis.get_top_expense_categories, month_df
+        ),
+        "precompute_period_views": partial(precompute_period_views, df),
+        "DescriptionIndex.__init__": partial(DescriptionIndex, df),
+        "DescriptionIndex.search[tesco]": partial(DescriptionIndex(df).search, "tesco"),
+        "Figures.category_spending_pie_figure[month]": partial(
+            Figures.category_spending_pie_figure, month_df
+        ),
+        "Figures.category_spending_over_time_figure[Month]": partial(
+            Figures.category_spending_over_time_figure,
+            category_spending_each_month_df,
+            "Month",
+        ),
+    }
+
+    if len(df) <= CSV_MAX_ROWS:
+        csv_text = io.StringIO()
+        csv.writer(csv_text).writerows(to_yonder_rows(df))
+        cases["parse_transaction_rows"] = partial(parse_csv, csv_text.getvalue())
+
+    return cases
+
+
+def time_case(func, repeat: int) -> list[float]:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--filter", default="", help="Only run cases containing this")
+    parser.add_argument("--output", default="benchmark_results.json")
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    results = []
+    for size in args.sizes:
+        df = generate_transactions(size, args.seed)
+        for name, func in benchmark_cases(df).items():
+            if args.filter not in name:
+                continue
+            timings = time_case(func, args.repeat)
+            results.append(
+                {
+                    "case": name,
+                    "rows": size,
+                    "seconds": timings,
+                    "min": min(timings),
+                    "median": statistics.median(timings),
+                }
+            )
+            print(f"{size:>10} {name:<60} {min(timings) * 1000:10.2f}ms")
+
+    report = {
+        "commit": git_commit(),
+        "created": dt.now().isoformat(timespec="seconds"),
+        "seed": args.seed,
+        "repeat": args.repeat,
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "results": results,
+    }
+    with open(args.output, "w") as file:
+        json.dump(report, file, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Simulate concurrent dashboard sessions reading the same month of analytics
+
+Usage: python -m benchmarks.sessions --rows 1000000 --sessions 1 10 50
+
+Each session reads the transactions, stats, rolling stats and category spending
+of one month from an AnalyticsView, like a monthly_view rerun without the
+rendering. "per-session" sessions build their own view from the shared
+transactions frame, "shared" sessions read one AnalyticsService built up front.
+Reported are the wall time of all sessions run on a thread pool and the memory
+they keep alive. Both should stay flat per session in the shared mode.
+"""
+
+import argparse
+import gc
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+from loguru import logger
+
+from benchmarks.synthetic import generate_transactions
+from personal_dashboard.backend.analytics_service import (
+    AnalyticsService,
+    AnalyticsView,
+)
+from personal_dashboard.backend.database import YONDER_DTYPES
+
+
+def run_session(
+    df: pd.DataFrame, service: AnalyticsService | None, month: pd.Period
+) -> AnalyticsView:
+    if service is None:
+        view = AnalyticsService.build_view(df, exclude_holiday=True)
+    else:
+        view = service.view(exclude_holiday=True)
+    # The data a monthly_view rerun reads before drawing anything
+    view.transaction_period.get_month_df(month.strftime("%Y-%m"))
+    view.period_rollups["month"]
+    view.get_period_view(month.start_time, "M")
+    rolling_spending = view.rolling_spending
+    rolling_spending.get_rolling_stats(
+        min(month.end_time.normalize(), rolling_spending.last_day)
+    )
+    return view
+
+
+def simulate(
+    df: pd.DataFrame, sessions: int, shared: bool, month: pd.Period
+) -> tuple[float, float, int]:
+    """Run the sessions concurrently, keeping them alive like open browser tabs
+
+    :return (setup_seconds, sessions_seconds, retained_bytes):
+    """
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    service = AnalyticsService(df) if shared else None
+    setup = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=sessions) as executor:
+        futures = [
+            executor.submit(run_session, df, service, month) for _ in range(sessions)
+        ]
+        views = [future.result() for future in futures]
+    elapsed = time.perf_counter() - start
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del futures, views, service
+    return setup, elapsed, retained
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    df = generate_transactions(args.rows, args.seed).astype(YONDER_DTYPES)
+    month = pd.Period(df.index[-1], "M") - 1
+
+    print(f"{args.rows} transactions, reading {month}")
+    print(
+        f"{'mode':<12} {'sessions':>8} {'setup':>9} {'sessions':>9} {'per session':>12} {'retained':>10}"
+    )
+    for sessions in args.sessions:
+        for label, shared in (("per-session", False), ("shared", True)):
+            setup, elapsed, retained = simulate(df, sessions, shared, month)
+            print(
+                f"{label:<12} {sessions:>8} {setup:>8.2f}s {elapsed:>8.2f}s "
+                f"{elapsed / sessions * 1000:>10.1f}ms {retained / 2**20:>6.1f} MiB"
+            )
+
+
+if __name__ == "__main__":
+    main()
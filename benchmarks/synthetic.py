@@ -0,0 +1,119 @@
+from datetime import datetime as dt
+
+import numpy as np
+import pandas as pd
+
+from personal_dashboard.backend.database import YONDER_COLUMNS, YONDER_DTYPES
+
+YONDER_HEADER = [
+    "Date/Time of transaction",
+    "Description",
+    "Amount (GBP)",
+    "Amount (in Charged Currency)",
+    "Currency",
+    "Category",
+    "Debit or Credit",
+    "Postcode",
+]
+
+# category: (merchants, lowest amount, highest amount, share of transactions)
+CATEGORIES = {
+    "Groceries": (["Tesco", "Sainsburys", "Waitrose", "Lidl", "Co-op"], 4, 90, 20),
+    "Eating Out": (["Pret A Manger", "Dishoom", "Wagamama", "Nandos"], 3, 80, 15),
+    "Transport": (["TfL Travel", "Uber", "Trainline", "Shell"], 2, 120, 15),
+    "Shopping": (["Amazon", "John Lewis", "Uniqlo", "Boots"], 5, 250, 12),
+    "Bills": (["Thames Water", "Octopus Energy", "Vodafone"], 20, 150, 5),
+    "Entertainment": (["Netflix", "Spotify", "Odeon", "Ticketmaster"], 5, 90, 8),
+    "Holiday": (["British Airways", "Airbnb", "Booking.com"], 40, 900, 2),
+    "General": (["Paypal", "Monzo Transfer", "Post Office"], 1, 60, 5),
+}
+# currency: (GBP exchange rate, share of transactions)
+CURRENCIES = {"GBP": (1.0, 90), "EUR": (1.17, 7), "USD": (1.27, 3)}
+POSTCODES = ["SW1A 1AA", "E1 6AN", "N1 9GU", "SE1 7PB", "W1D 3QU", ""]
+
+# Roughly ten transactions a day, compressed for very large histories so that
+# timestamps stay within pandas' datetime range
+MEAN_SECONDS_BETWEEN_TRANSACTIONS = 3 * 3600
+MAX_HISTORY_SECONDS = 25 * 365 * 24 * 3600
+
+
+def generate_transactions(
+    n_rows: int, seed: int = 0, start: dt = dt(2000, 1, 1)
+) -> pd.DataFrame:
+    """Generate Yonder-shaped transactions, typed and indexed like the dashboard's
+
+    Generation is vectorised so that 10M rows take seconds. Timestamps are
+    strictly increasing, so every row is unique on transaction_time.
+    """
+    rng = np.random.default_rng(seed)
+
+    mean_gap = max(
+        2, min(MEAN_SECONDS_BETWEEN_TRANSACTIONS, MAX_HISTORY_SECONDS // max(n_rows, 1))
+    )
+    gaps = rng.integers(1, 2 * mean_gap, n_rows)
+    transaction_time = pd.Timestamp(start) + pd.to_timedelta(np.cumsum(gaps), unit="s")
+
+    categories = list(CATEGORIES)
+    shares = np.array([CATEGORIES[category][3] for category in categories], float)
+    category_codes = rng.choice(len(categories), n_rows, p=shares / shares.sum())
+
+    lows = np.array([CATEGORIES[category][1] for category in categories], float)
+    highs = np.array([CATEGORIES[category][2] for category in categories], float)
+    amount_gbp = np.round(rng.uniform(lows[category_codes], highs[category_codes]), 2)
+
+    merchant_picks = rng.random(n_rows)
+    descriptions = np.empty(n_rows, dtype=object)
+    for code, category in enumerate(categories):
+        merchants = np.array(CATEGORIES[category][0], dtype=object)
+        rows = category_codes == code
+        descriptions[rows] = merchants[
+            (merchant_picks[rows] * len(merchants)).astype(int)
+        ]
+
+    currencies = list(CURRENCIES)
+    currency_shares = np.array([CURRENCIES[currency][1] for currency in currencies])
+    currency_codes = rng.choice(
+        len(currencies), n_rows, p=currency_shares / currency_shares.sum()
+    )
+    rates = np.array([CURRENCIES[currency][0] for currency in currencies])
+
+    df = pd.DataFrame(
+        {
+            "transaction_time": transaction_time,
+            "description": descriptions,
+            "amount_gbp": amount_gbp,
+            "amount_ccy": np.round(amount_gbp * rates[currency_codes], 2),
+            "currency": pd.Categorical.from_codes(currency_codes, currencies),
+            "category": pd.Categorical.from_codes(category_codes, categories),
+            "debit_or_credit": pd.Categorical.from_codes(
+                (rng.random(n_rows) >= 0.03).astype(int), ["Credit", "Debit"]
+            ),
+            "postcode": np.array(POSTCODES, dtype=object)[
+                rng.integers(0, len(POSTCODES), n_rows)
+            ],
+        }
+    )
+    return df.astype(YONDER_DTYPES).set_index("transaction_time")
+
+
+def to_yonder_rows(df: pd.DataFrame) -> list[list[str]]:
+    """Format transactions as the rows of a Yonder CSV export, header included"""
+    columns = {
+        "transaction_time": df.index.strftime("%Y-%m-%d %H:%M:%S"),
+        "description": df["description"],
+        "amount_gbp": df["amount_gbp"].map("{:.2f}".format),
+        "amount_ccy": df["amount_ccy"].map("{:.2f}".format),
+        "currency": df["currency"].astype(str),
+        "category": df["category"].astype(str),
+        "debit_or_credit": df["debit_or_credit"].astype(str),
+        "postcode": df["postcode"],
+    }
+    rows = zip(*(list(columns[column]) for column in YONDER_COLUMNS))
+    return [YONDER_HEADER] + [list(row) for row in rows]
+
+
+def generate_yonder_rows(
+    n_rows: int, seed: int = 0, start: dt = dt(2020, 1, 1)
+) -> list[list[str]]:
+    """Generate a Yonder-shaped CSV export, header row included"""
+    return to_yonder_rows(generate_transactions(n_rows, seed, start))
@@ -0,0 +1,217 @@
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+
+import pandas as pd
+from loguru import logger
+
+from personal_dashboard.backend.financial_analysis import (
+    SpendingAnalysis,
+    Stats,
+    TransactionPeriod,
+)
+from personal_dashboard.backend.period_precompute import (
+    MAX_WORKERS,
+    PeriodView,
+    PeriodViewCache,
+    get_category_totals,
+    precompute_period_views,
+)
+from personal_dashboard.backend.rolling_analysis import RollingSpending
+from personal_dashboard.backend.search_index import DescriptionIndex
+from personal_dashboard.backend.timing import timed
+
+# Rollup period -> pandas period frequency used when regrouping transactions
+# instead. W-SUN periods are the Monday to Sunday weeks of date_trunc('week').
+ROLLUP_FREQUENCIES = {"day": "D", "week": "W-SUN", "month": "M"}
+
+
+@dataclass(frozen=True)
+class AnalyticsView:
+    """Everything a dashboard session reads for one exclude_holiday setting
+
+    Every member is computed up front and shared read-only between sessions,
+    except period_views which the service fills in the background. Serves the
+    dashboard as a PeriodData.
+    """
+
+    version: tuple
+    exclude_holiday: bool
+    df: pd.DataFrame
+    transaction_period: TransactionPeriod
+    period_rollups: dict[str, pd.DataFrame]
+    # Total spending of every week ("W") and month ("M"), gaps as zero
+    period_totals: dict[str, pd.Series]
+    rolling_spending: RollingSpending
+    search_index: DescriptionIndex
+    period_views: PeriodViewCache
+
+    @timed("AnalyticsView.get_period_view")
+    def get_period_view(self, chosen_datetime: datetime, frequency: str) -> PeriodView:
+        """Stats and pie data of the week ("W") or month ("M") holding chosen_datetime
+
+        Usually a lookup of the precomputed view, computed on demand otherwise.
+        """
+        period = pd.Period(chosen_datetime, frequency)
+
+        def compute():
+            period_df = self.df.loc[period.start_time : period.end_time]
+            return PeriodView(
+                stats=SpendingAnalysis.get_stats(
+                    period_df, self.period_totals[frequency], period
+                ),
+                category_totals=get_category_totals(period_df),
+            )
+
+        return self.period_views.get_or_compute(
+            (self.exclude_holiday, frequency, period), compute
+        )
+
+    def get_period_df(self, chosen_datetime: datetime, frequency: str) -> pd.DataFrame:
+        if frequency == "W":
+            iso = chosen_datetime.isocalendar()
+            return self.transaction_period.get_week_df(iso.year, iso.week)
+        return self.transaction_period.get_month_df(chosen_datetime.strftime("%Y-%m"))
+
+    def get_stats(self, chosen_datetime: datetime, frequency: str) -> Stats:
+        return self.get_period_view(chosen_datetime, frequency).stats
+
+    def get_category_totals(
+        self, chosen_datetime: datetime, frequency: str
+    ) -> pd.Series:
+        return self.get_period_view(chosen_datetime, frequency).category_totals
+
+    def get_category_spending_each_period(self, rollup_period: str) -> pd.DataFrame:
+        return self.period_rollups[rollup_period]
+
+    def get_rolling_spending(self) -> RollingSpending:
+        return self.rolling_spending
+
+    def search(self, text: str) -> pd.DataFrame:
+        return self.search_index.search(text)
+
+    def get_available_years(self) -> list[int]:
+        return sorted(set(self.period_rollups["month"].index.year))
+
+    def get_available_months(self, year: int) -> list[int]:
+        months = self.period_rollups["month"].index
+        return list(months[months.year == year].month)
+
+    def get_available_weeks(self, year: int, month: int) -> list[datetime]:
+        weeks = self.period_rollups["week"].index
+        return list(weeks[(weeks.year == year) & (weeks.month == month)])
+
+
+class AnalyticsService:
+    """Precomputed analytics of one data version, shared by every session
+
+    Both exclude_holiday variants are built once on construction, so serving a
+    session is a lookup whatever the number of concurrent viewers. The views of
+    every week and month are then precomputed by start_precompute into a cache
+    shared by both variants.
+
+    :param df: All transactions indexed by time. The frame is never modified.
+    :param version: Version of df, e.g. TransactionCache.version
+    :param period_rollups: Optional category spending per rollup period read
+        from the database, used instead of regrouping df
+    """
+
+    @timed("AnalyticsService.__init__")
+    def __init__(
+        self,
+        df: pd.DataFrame,
+        version: tuple = (),
+        period_rollups: dict[str, pd.DataFrame] | None = None,
+    ):
+        self.version = version
+        self.period_views = PeriodViewCache()
+        self.views = {
+            exclude_holiday: AnalyticsService.build_view(
+                df, exclude_holiday, period_rollups, self.period_views, version
+            )
+            for exclude_holiday in (False, True)
+        }
+        self._precompute: threading.Thread | None = None
+        logger.info(f"Built analytics of {len(df)} transactions at version {version}")
+
+    def view(self, exclude_holiday: bool) -> AnalyticsView:
+        return self.views[exclude_holiday]
+
+    def start_precompute(self, max_workers: int = MAX_WORKERS):
+        """Precompute every period view in the background, once per service"""
+        if self._precompute is not None:
+            return
+        self._precompute = threading.Thread(
+            target=self.precompute,
+            args=(max_workers,),
+            name="period-precompute",
+            daemon=True,
+        )
+        self._precompute.start()
+
+    @timed("AnalyticsService.precompute")
+    def precompute(self, max_workers: int = MAX_WORKERS):
+        try:
+            for exclude_holiday, view in self.views.items():
+                period_views = precompute_period_views(view.df, max_workers=max_workers)
+                for (frequency, period), period_view in period_views.items():
+                    self.period_views.put(
+                        (exclude_holiday, frequency, period), period_view
+                    )
+        except Exception as e:
+            logger.exception(f"Failed to precompute period views: {e}")
+
+    @staticmethod
+    @timed("AnalyticsService.build_view")
+    def build_view(
+        df: pd.DataFrame,
+        exclude_holiday: bool,
+        period_rollups: dict[str, pd.DataFrame] | None = None,
+        period_views: PeriodViewCache | None = None,
+        version: tuple = (),
+    ) -> AnalyticsView:
+        if exclude_holiday:
+            is_holiday = df["category"] == "Holiday"
+            if is_holiday.any():
+                df = df[~is_holiday]
+        transaction_period = TransactionPeriod(df)
+
+        if period_rollups is None:
+            period_rollups = {
+                period: transaction_period.get_category_spending_by_period(frequency)
+                for period, frequency in ROLLUP_FREQUENCIES.items()
+            }
+        elif exclude_holiday:
+            period_rollups = {
+                period: rollup.drop(columns="Holiday", errors="ignore")
+                for period, rollup in period_rollups.items()
+            }
+
+        # Build the lazily computed period keys now, rather than in a session
+        transaction_period._week_keys
+        transaction_period._month_keys
+
+        # From the transactions rather than the rollups, which leave out
+        # transactions without a category
+        period_totals = {}
+        for frequency in ("W", "M"):
+            amounts = transaction_period.df["amount_gbp"]
+            totals = amounts.groupby(amounts.index.to_period(frequency)).sum()
+            if not totals.empty:
+                totals = totals.reindex(
+                    pd.period_range(totals.index[0], totals.index[-1], freq=frequency),
+                    fill_value=0.0,
+                )
+            period_totals[frequency] = totals
+
+        return AnalyticsView(
+            version=version,
+            exclude_holiday=exclude_holiday,
+            df=transaction_period.df,
+            transaction_period=transaction_period,
+            period_rollups=period_rollups,
+            period_totals=period_totals,
+            rolling_spending=RollingSpending(period_rollups["day"]),
+            search_index=DescriptionIndex(transaction_period.df),
+            period_views=PeriodViewCache() if period_views is None else period_views,
+        )
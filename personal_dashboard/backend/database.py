@@ -1,13 +1,196 @@
+import atexit
+import io
 import os
+import threading
+from datetime import datetime
+from functools import cache
+from typing import TYPE_CHECKING, ContextManager, Iterable, Iterator
 
 import httpx
-import pandas as pd
 import psycopg
 from dotenv import load_dotenv
 from loguru import logger
+from psycopg_pool import ConnectionPool
+
+from personal_dashboard.backend.timing import timed
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 YONDER = "yonder_transactions"
+YONDER_STAGING = "yonder_transactions_staging"
+YONDER_ROLLUPS = "yonder_period_rollups"
+INGESTED_FILES = "telegram_ingested_files"
+ROLLUP_PERIODS = ("day", "week", "month")
+YONDER_COLUMNS = (
+    "transaction_time",
+    "description",
+    "amount_gbp",
+    "amount_ccy",
+    "currency",
+    "category",
+    "debit_or_credit",
+    "postcode",
+)
+# Compact in-memory schema: descriptions are Arrow strings held in one buffer
+# rather than a Python object per row, low-cardinality columns are categorical.
+# Amounts stay float64, which is exact to the penny for any realistic total.
+YONDER_DTYPES = {
+    "description": "string[pyarrow]",
+    "amount_gbp": "float64",
+    "amount_ccy": "float64",
+    "currency": "category",
+    "category": "category",
+    "debit_or_credit": "category",
+    "postcode": "category",
+}
+# Identifies a transaction by its content rather than its time, so distinct rows
+# sharing a timestamp are kept. md5 is only used as a compact immutable digest.
+CONTENT_HASH = """md5(
+    extract(epoch FROM transaction_time)::text
+    || E'\\x1f' || coalesce(description, '')
+    || E'\\x1f' || coalesce(amount_gbp::numeric::text, '')
+    || E'\\x1f' || coalesce(currency, '')
+)::uuid"""
+SCHEMA = [
+    f"""CREATE TABLE IF NOT EXISTS {YONDER_ROLLUPS} (
+        period text NOT NULL,
+        period_start timestamp NOT NULL,
+        category text NOT NULL,
+        total double precision NOT NULL,
+        transaction_count integer NOT NULL,
+        max_amount double precision NOT NULL,
+        PRIMARY KEY (period, period_start, category)
+    )""",
+    f"""CREATE TABLE IF NOT EXISTS {INGESTED_FILES} (
+        file_unique_id text PRIMARY KEY,
+        update_id bigint,
+        received_at timestamptz NOT NULL DEFAULT now()
+    )""",
+    f"CREATE INDEX IF NOT EXISTS {YONDER}_time_idx ON {YONDER} (transaction_time)",
+    f"CREATE INDEX IF NOT EXISTS {YONDER}_category_time_idx ON {YONDER} (category, transaction_time)",
+]
+# Moves deduplication from the transaction_time primary key to the content hash.
+# Only run while content_hash is missing, as it rewrites the table.
+CONTENT_HASH_MIGRATION = [
+    # Identical rows within one upload are numbered so they are all kept
+    f"ALTER TABLE {YONDER} ADD COLUMN IF NOT EXISTS duplicate_ordinal integer NOT NULL DEFAULT 0",
+    f"ALTER TABLE {YONDER} ADD COLUMN IF NOT EXISTS content_hash uuid GENERATED ALWAYS AS ({CONTENT_HASH}) STORED",
+    f"CREATE UNIQUE INDEX IF NOT EXISTS {YONDER}_content_hash_idx ON {YONDER} (content_hash, duplicate_ordinal)",
+    f"ALTER TABLE {YONDER} DROP CONSTRAINT IF EXISTS {YONDER}_pkey",
+]
+# Adds the (period, category) spending of the rows of {source} to the rollups.
+# Additive so that concurrent ingests touching the same period both count: the
+# conflicting row is locked and the increment applied to its latest version.
+ROLLUP_UPDATE = f"""
+    INSERT INTO {YONDER_ROLLUPS} AS r (period, period_start, category, total, transaction_count, max_amount)
+    SELECT p.period, date_trunc(p.period, transaction_time), category, sum(amount_gbp), count(*), max(amount_gbp)
+    FROM {{source}} CROSS JOIN unnest(%(periods)s::text[]) AS p(period)
+    WHERE category IS NOT NULL
+    GROUP BY 1, 2, 3
+    ON CONFLICT (period, period_start, category) DO UPDATE SET
+        total = r.total + EXCLUDED.total,
+        transaction_count = r.transaction_count + EXCLUDED.transaction_count,
+        max_amount = greatest(r.max_amount, EXCLUDED.max_amount)
+"""
 load_dotenv()
+# Rows fetched per round trip by the server-side cursors of the stream methods
+STREAM_BATCH_SIZE = int(os.getenv("DATABASE_STREAM_BATCH_SIZE", 2000))
+POOL_MAX_SIZE = int(os.getenv("DATABASE_POOL_MAX_SIZE", 4))
+POOL_MAX_IDLE = float(os.getenv("DATABASE_POOL_MAX_IDLE", 300))
+
+_pool: ConnectionPool | None = None
+_pool_lock = threading.Lock()
+
+
+class _CopyReader(io.RawIOBase):
+    """Read-only file object over the chunks of a COPY ... TO STDOUT"""
+
+    def __init__(self, copy: psycopg.Copy):
+        self._chunks = iter(copy)
+        self._buffer = bytearray()
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        # COPY yields one small chunk per row, so gather enough to fill the buffer
+        while len(self._buffer) < len(buffer):
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buffer += chunk
+
+        size = min(len(buffer), len(self._buffer))
+        buffer[:size] = self._buffer[:size]
+        del self._buffer[:size]
+        return size
+
+
+def parse_transaction_rows(csv_rows: Iterable[list[str]]) -> Iterator[tuple]:
+    """Convert raw Yonder CSV rows into typed transaction tuples
+
+    :param csv_rows: Rows from csv.reader, including the header row
+    :return: Generator of tuples ordered as YONDER_COLUMNS
+    """
+    rows = iter(csv_rows)
+    next(rows, None)  # header
+    for row in rows:
+        yield (
+            row[0],
+            row[1],
+            float(row[2]),
+            float(row[3]),
+            row[4],
+            row[5],
+            row[6],
+            row[7],
+        )
+
+
+def transaction_filters(
+    watermark: datetime | None = None,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    categories: tuple[str, ...] = (),
+    exclude_categories: tuple[str, ...] = (),
+    description_words: tuple[str, ...] = (),
+) -> tuple[str, dict]:
+    """WHERE clause and parameters selecting transactions of the YONDER table
+
+    :param watermark: Only select transactions after this time
+    :param start: Only select transactions at or after this time
+    :param end: Only select transactions before this time
+    :param categories: Only select transactions of these categories
+    :param exclude_categories: Leave out transactions of these categories
+    :param description_words: Only select transactions whose description
+        contains every one of these words, ignoring case
+    :return (where, params): where is empty when nothing is filtered
+    """
+    conditions, params = [], {}
+    if watermark is not None:
+        conditions.append("transaction_time > %(watermark)s")
+        params["watermark"] = watermark
+    if start is not None:
+        conditions.append("transaction_time >= %(start)s")
+        params["start"] = start
+    if end is not None:
+        conditions.append("transaction_time < %(end)s")
+        params["end"] = end
+    if categories:
+        conditions.append("category = ANY(%(categories)s)")
+        params["categories"] = list(categories)
+    if exclude_categories:
+        conditions.append("coalesce(category, '') <> ALL(%(excluded)s)")
+        params["excluded"] = list(exclude_categories)
+    for i, word in enumerate(description_words):
+        # Served by the trigram index when pg_trgm is available
+        conditions.append(f"description ILIKE %(word{i})s")
+        escaped = word.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        params[f"word{i}"] = f"%{escaped}%"
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    return where, params
 
 
 class SqlConnections:
@@ -26,6 +209,87 @@ class SqlConnections:
             logger.error(e)
             return
 
+    def get_pool() -> ConnectionPool:
+        """Process-wide connection pool, opened on first use
+
+        Connections are checked before being handed out and closed after
+        POOL_MAX_IDLE seconds without use, keeping warm Cloud Function instances
+        and Streamlit reruns off the TLS handshake. The schema is not touched,
+        ensure_schema is run by personal_dashboard.migrate.
+        """
+        global _pool
+
+        with _pool_lock:
+            if _pool is None:
+                SqlConnections.download_ca_cert()
+                _pool = ConnectionPool(
+                    os.getenv("DATABASE_URL_PSYCOPG"),
+                    min_size=1,
+                    max_size=POOL_MAX_SIZE,
+                    max_idle=POOL_MAX_IDLE,
+                    check=ConnectionPool.check_connection,
+                    name=YONDER,
+                    open=True,
+                )
+                atexit.register(_pool.close)
+                logger.info(
+                    f"Opened connection pool with up to {POOL_MAX_SIZE} connections"
+                )
+            return _pool
+
+    def connection() -> ContextManager[psycopg.Connection]:
+        """Borrow a pooled connection for the duration of a with block
+
+        The connection goes back to the pool on exit, committed on success and
+        rolled back if the block raised.
+        """
+        return SqlConnections.get_pool().connection()
+
+    def ensure_schema(conn: psycopg.Connection):
+        """Create the tables and indexes maintained by this module if missing
+
+        The rollups of each period are backfilled from the transactions table
+        when there are none yet, e.g. after a period is added to ROLLUP_PERIODS.
+        Several statements lock out every reader, so this only runs from the
+        personal_dashboard.migrate command.
+        """
+        with conn.cursor() as cur:
+            for statement in SCHEMA:
+                cur.execute(statement)
+
+            cur.execute(
+                "SELECT NOT EXISTS (SELECT FROM pg_attribute WHERE attrelid = %s::regclass AND attname = 'content_hash' AND NOT attisdropped)",
+                (YONDER,),
+            )
+            if cur.fetchone()[0]:
+                logger.info(f"Adding content hashes to {YONDER}")
+                for statement in CONTENT_HASH_MIGRATION:
+                    cur.execute(statement)
+
+            # Managed databases may not offer the extension, searches then scan
+            try:
+                with conn.transaction():
+                    cur.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+                    cur.execute(
+                        f"CREATE INDEX IF NOT EXISTS {YONDER}_description_trgm_idx ON {YONDER} USING gin (description gin_trgm_ops)"
+                    )
+            except psycopg.Error as e:
+                logger.warning(f"Searching descriptions without a trigram index: {e}")
+
+            cur.execute(
+                f"""SELECT array_agg(missing.period) FROM unnest(%s::text[]) AS missing(period)
+                WHERE NOT EXISTS (SELECT FROM {YONDER_ROLLUPS} r WHERE r.period = missing.period)
+                    AND EXISTS (SELECT FROM {YONDER})""",
+                (list(ROLLUP_PERIODS),),
+            )
+            missing = cur.fetchone()[0]
+            if missing:
+                logger.info(f"Backfilling {YONDER_ROLLUPS} for {', '.join(missing)}")
+                SqlConnections.update_period_rollups(conn, YONDER, periods=missing)
+
+        conn.commit()
+
+    @cache
     def download_ca_cert():
         dest_dir = os.path.join(os.getenv("HOME"), ".postgresql")
         dest_file = os.path.join(dest_dir, "root.crt")
@@ -55,11 +319,13 @@ class SqlConnections:
                 raise e()
 
     def sql_disconnect(conn: psycopg.Connection):
-        logger.info(f"Closing connection to SQL database.")
+        logger.info("Closing connection to SQL database.")
         conn.close()
 
     def upsert_transaction(conn: psycopg.Connection, csv_list: list[str]):
 
+        new_rows = []
+        occurrences = {}
         with conn.cursor() as cur:
             for row in csv_list[1:]:
                 transaction_time = row[0]
@@ -71,11 +337,16 @@ class SqlConnections:
                 debit_or_credit = row[6]
                 postcode = row[7]
 
+                # Numbers identical rows like bulk_upsert_transactions does
+                key = (transaction_time, description, amount_gbp, currency)
+                duplicate_ordinal = occurrences.get(key, 0)
+                occurrences[key] = duplicate_ordinal + 1
+
                 logger.debug(
                     f"{transaction_time=}, {description=}, {amount_gbp=}, {amount_charged_ccy=}, {currency=}, {category=}, {debit_or_credit=}, {postcode=}"
                 )
                 cur.execute(
-                    f"INSERT INTO {YONDER}(transaction_time, description, amount_gbp, amount_ccy, currency, category, debit_or_credit, postcode) VALUES (%s, %s, %s, %s, %s, %s, %s, %s) ON CONFLICT (transaction_time) DO NOTHING",
+                    f"INSERT INTO {YONDER}(transaction_time, description, amount_gbp, amount_ccy, currency, category, debit_or_credit, postcode, duplicate_ordinal) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s) ON CONFLICT (content_hash, duplicate_ordinal) DO NOTHING",
                     (
                         transaction_time,
                         description,
@@ -85,21 +356,401 @@ class SqlConnections:
                         category,
                         debit_or_credit,
                         postcode,
+                        duplicate_ordinal,
                     ),
                 )
+                if cur.rowcount:
+                    new_rows.append((transaction_time, category, amount_gbp))
+
+            if new_rows:
+                times, categories, amounts = zip(*new_rows)
+                SqlConnections.update_period_rollups(
+                    conn,
+                    "unnest(%(times)s::timestamp[], %(categories)s::text[], %(amounts)s::double precision[]) AS new_rows(transaction_time, category, amount_gbp)",
+                    {
+                        "times": list(times),
+                        "categories": list(categories),
+                        "amounts": list(amounts),
+                    },
+                )
 
             conn.commit()
 
-    def get_all_transactions_as_table(conn: psycopg.Connection) -> pd.DataFrame:
+    def get_all_transactions_as_table(conn: psycopg.Connection) -> "pd.DataFrame":
+        """Fetch every transaction as a typed frame indexed by transaction_time"""
+        return SqlConnections.copy_transactions_to_frame(conn)
+
+    @timed("SqlConnections.copy_transactions_to_frame")
+    def copy_transactions_to_frame(
+        conn: psycopg.Connection,
+        watermark: datetime | None = None,
+        start: datetime | None = None,
+        end: datetime | None = None,
+        exclude_categories: tuple[str, ...] = (),
+        description_words: tuple[str, ...] = (),
+    ) -> "pd.DataFrame":
+        """Stream transactions out with COPY straight into typed columns
+
+        The CSV produced by the server is parsed by pandas' C reader as it arrives,
+        so no intermediate Python tuple or datetime is built per row. Columns
+        follow YONDER_DTYPES and the frame is indexed by transaction_time in
+        ascending order.
+
+        :param watermark: Only fetch transactions after this time
+        :param start: Only fetch transactions at or after this time
+        :param end: Only fetch transactions before this time
+        :param exclude_categories: Leave out transactions of these categories
+        :param description_words: Only fetch transactions whose description
+            contains every one of these words, ignoring case
+        """
+        # Imported here so the webhook, which never builds a frame, skips pandas
+        import pandas as pd
+
+        where, params = transaction_filters(
+            watermark=watermark,
+            start=start,
+            end=end,
+            exclude_categories=exclude_categories,
+            description_words=description_words,
+        )
+        columns = ", ".join(YONDER_COLUMNS)
+        query = f"COPY (SELECT {columns} FROM {YONDER} {where} ORDER BY transaction_time) TO STDOUT WITH (FORMAT CSV, HEADER)"
+
+        with conn.cursor() as cur:
+            with cur.copy(query, params or None) as copy:
+                df = pd.read_csv(
+                    io.BufferedReader(_CopyReader(copy)),
+                    dtype=YONDER_DTYPES,
+                    parse_dates=["transaction_time"],
+                    index_col="transaction_time",
+                )
+
+        # An empty result leaves an object index behind
+        df.index = pd.DatetimeIndex(df.index)
+
+        return df
+
+    def bulk_upsert_transactions(
+        conn: psycopg.Connection, rows: Iterable[tuple], use_copy: bool = True
+    ) -> tuple[int, int]:
+        """Load transactions through a staging table and merge them in one statement
+
+        Rows are streamed into a temporary staging table with COPY (or a pipelined
+        executemany when use_copy is False), where each gets its content hash.
+        Staged rows whose hash is already stored are then dropped in one indexed
+        join, and the rows the INSERT ... SELECT actually stores are added to the
+        rollups in the same statement, so a row a concurrent ingest stored first
+        is counted once.
+        Identical rows within the upload are numbered by duplicate_ordinal, so they
+        are all kept while a re-upload still skips them.
+
+        :param rows: Tuples ordered as YONDER_COLUMNS, e.g. from parse_transaction_rows
+        :return (inserted, skipped): Number of new rows and number of duplicates
+        """
+        columns = ", ".join(YONDER_COLUMNS)
+
+        with conn.cursor() as cur:
+            cur.execute(
+                f"CREATE TEMP TABLE {YONDER_STAGING} (LIKE {YONDER} INCLUDING DEFAULTS INCLUDING GENERATED) ON COMMIT DROP"
+            )
+
+            if use_copy:
+                with cur.copy(f"COPY {YONDER_STAGING} ({columns}) FROM STDIN") as copy:
+                    for row in rows:
+                        copy.write_row(row)
+            else:
+                placeholders = ", ".join(["%s"] * len(YONDER_COLUMNS))
+                cur.executemany(
+                    f"INSERT INTO {YONDER_STAGING} ({columns}) VALUES ({placeholders})",
+                    rows,
+                )
+
+            cur.execute(f"SELECT count(*) FROM {YONDER_STAGING}")
+            staged = cur.fetchone()[0]
+
+            cur.execute(
+                f"""UPDATE {YONDER_STAGING} s SET duplicate_ordinal = numbered.ordinal
+                FROM (
+                    SELECT ctid, row_number() OVER (PARTITION BY content_hash ORDER BY ctid) - 1 AS ordinal
+                    FROM {YONDER_STAGING}
+                ) numbered
+                WHERE s.ctid = numbered.ctid AND numbered.ordinal > 0"""
+            )
+            cur.execute(
+                f"""DELETE FROM {YONDER_STAGING} s USING {YONDER} t
+                WHERE t.content_hash = s.content_hash AND t.duplicate_ordinal = s.duplicate_ordinal"""
+            )
+
+            cur.execute(
+                f"""WITH inserted AS (
+                    INSERT INTO {YONDER} ({columns}, duplicate_ordinal)
+                    SELECT {columns}, duplicate_ordinal FROM {YONDER_STAGING}
+                    ON CONFLICT (content_hash, duplicate_ordinal) DO NOTHING
+                    RETURNING transaction_time, category, amount_gbp
+                ), rollups AS ({ROLLUP_UPDATE.format(source="inserted")})
+                SELECT count(*) FROM inserted""",
+                {"periods": list(ROLLUP_PERIODS)},
+            )
+            inserted = cur.fetchone()[0]
+
+        conn.commit()
+
+        skipped = staged - inserted
+        logger.info(f"Inserted {inserted} transactions, skipped {skipped} duplicates")
+        return inserted, skipped
+
+    @timed("SqlConnections.search_transactions")
+    def search_transactions(
+        conn: psycopg.Connection, text: str, exclude_categories: tuple[str, ...] = ()
+    ) -> "pd.DataFrame":
+        """Transactions whose description contains every word of text, ignoring case"""
+        return SqlConnections.copy_transactions_to_frame(
+            conn,
+            exclude_categories=exclude_categories,
+            description_words=tuple(text.lower().split()),
+        )
+
+    def stream_transactions(
+        conn: psycopg.Connection,
+        start: datetime | None = None,
+        end: datetime | None = None,
+        categories: tuple[str, ...] = (),
+        exclude_categories: tuple[str, ...] = (),
+        description_words: tuple[str, ...] = (),
+        batch_size: int = STREAM_BATCH_SIZE,
+    ) -> Iterator[tuple]:
+        """Transactions in time order, read through a server-side cursor
+
+        Only batch_size rows are held client-side at a time, whatever the size of
+        the history. The cursor lives in the connection's transaction, so the
+        connection must stay borrowed until the generator is exhausted or closed.
+        Filters are those of transaction_filters.
+
+        :return: Generator of tuples ordered as YONDER_COLUMNS
+        """
+        where, params = transaction_filters(
+            start=start,
+            end=end,
+            categories=categories,
+            exclude_categories=exclude_categories,
+            description_words=description_words,
+        )
+        columns = ", ".join(YONDER_COLUMNS)
+        with conn.cursor(name="stream_transactions") as cur:
+            cur.itersize = batch_size
+            cur.execute(
+                f"SELECT {columns} FROM {YONDER} {where} ORDER BY transaction_time",
+                params or None,
+            )
+            yield from cur
+
+    def stream_period_summaries(
+        conn: psycopg.Connection,
+        period: str,
+        start: datetime | None = None,
+        end: datetime | None = None,
+        exclude_categories: tuple[str, ...] = (),
+        batch_size: int = STREAM_BATCH_SIZE,
+    ) -> Iterator[tuple]:
+        """Spending of every day, week or month read from the rollup table
 
+        Read through a server-side cursor like stream_transactions.
+
+        :param period: One of ROLLUP_PERIODS
+        :param start: Only include periods starting at or after this time
+        :param end: Only include periods starting before this time
+        :return: Generator of (period_start, total, transaction_count, max_amount)
+            tuples in time order
+        """
+        with conn.cursor(name="stream_period_summaries") as cur:
+            cur.itersize = batch_size
+            cur.execute(
+                f"""SELECT period_start, sum(total), sum(transaction_count), max(max_amount)
+                FROM {YONDER_ROLLUPS}
+                WHERE period = %(period)s AND category <> ALL(%(excluded)s)
+                    AND (%(start)s::timestamp IS NULL OR period_start >= %(start)s)
+                    AND (%(end)s::timestamp IS NULL OR period_start < %(end)s)
+                GROUP BY period_start ORDER BY period_start""",
+                {
+                    "period": period,
+                    "excluded": list(exclude_categories),
+                    "start": start,
+                    "end": end,
+                },
+            )
+            yield from cur
+
+    def get_transactions_watermark(
+        conn: psycopg.Connection,
+    ) -> tuple[datetime | None, int]:
+        """Cheap probe used to decide whether cached transactions are stale
+
+        :return (max_transaction_time, row_count): None for an empty table
+        """
         with conn.cursor() as cur:
-            query = f"SELECT * FROM {YONDER}"
-            cur.execute(query)
+            cur.execute(f"SELECT max(transaction_time), count(*) FROM {YONDER}")
+            return cur.fetchone()
+
+    def get_transactions_since(
+        conn: psycopg.Connection, watermark: datetime
+    ) -> "pd.DataFrame":
+        return SqlConnections.copy_transactions_to_frame(conn, watermark)
+
+    def get_transactions_between(
+        conn: psycopg.Connection,
+        start: datetime,
+        end: datetime,
+        exclude_categories: tuple[str, ...] = (),
+    ) -> "pd.DataFrame":
+        """Transactions from start up to but excluding end, e.g. one week or month"""
+        return SqlConnections.copy_transactions_to_frame(
+            conn, start=start, end=end, exclude_categories=exclude_categories
+        )
+
+    def get_data_version(conn: psycopg.Connection) -> tuple[datetime | None, int]:
+        """Probe like get_transactions_watermark that avoids counting the table
+
+        The row count is summed from the monthly rollups, so the probe stays an
+        index lookup plus a scan of one row per (month, category).
+        """
+        with conn.cursor() as cur:
+            cur.execute(
+                f"""SELECT
+                    (SELECT max(transaction_time) FROM {YONDER}),
+                    (SELECT coalesce(sum(transaction_count), 0) FROM {YONDER_ROLLUPS} WHERE period = 'month')"""
+            )
+            return cur.fetchone()
+
+    def update_period_rollups(
+        conn: psycopg.Connection,
+        source: str,
+        params: dict | None = None,
+        periods: tuple[str, ...] = ROLLUP_PERIODS,
+    ):
+        """Add new rows to the daily, weekly and monthly category rollups
+
+        Runs inside the caller's transaction. Only the rows of source are read,
+        so they must not have been counted yet.
 
+        :param source: Table or aliased FROM item with transaction_time, category
+            and amount_gbp columns
+        :param params: Extra query parameters referenced by source
+        :param periods: Rollup periods to update, all by default
+        """
+        with conn.cursor() as cur:
+            cur.execute(
+                ROLLUP_UPDATE.format(source=source),
+                {"periods": list(periods), **(params or {})},
+            )
+
+    @timed("SqlConnections.get_period_rollups")
+    def get_period_rollups(conn: psycopg.Connection, period: str) -> "pd.DataFrame":
+        """Category spending per day, week or month read from the rollup table
+
+        :param period: One of ROLLUP_PERIODS
+        :return: Frame indexed by period start with one column per category, laid
+            out like TransactionPeriod.get_periodic_category_spending_df
+        """
+        import pandas as pd
+
+        with conn.cursor() as cur:
+            cur.execute(
+                f"SELECT period_start, category, total FROM {YONDER_ROLLUPS} WHERE period = %s ORDER BY period_start",
+                (period,),
+            )
             rows = cur.fetchall()
 
-            colnames = [desc[0] for desc in cur.description]
+        df = pd.DataFrame(rows, columns=["transaction_time", "category", "amount_gbp"])
+        return df.pivot_table(
+            index="transaction_time",
+            columns="category",
+            values="amount_gbp",
+            aggfunc="sum",
+            fill_value=0,
+        )
 
-            df = pd.DataFrame(rows, columns=colnames)
+    def is_file_ingested(conn: psycopg.Connection, file_unique_id: str) -> bool:
+        """Whether a Telegram document has already been loaded"""
+        with conn.cursor() as cur:
+            cur.execute(
+                f"SELECT 1 FROM {INGESTED_FILES} WHERE file_unique_id = %s",
+                (file_unique_id,),
+            )
+            return cur.fetchone() is not None
 
-        return df
+    def claim_file(
+        conn: psycopg.Connection, file_unique_id: str, update_id: int | None = None
+    ) -> bool:
+        """Record a Telegram document as ingested within the caller's transaction
+
+        A concurrent claim of the same document waits for this transaction, so
+        committing the claim together with the transactions it loaded makes
+        redelivered webhooks a no-op.
+
+        :return: False when the document was already claimed
+        """
+        with conn.cursor() as cur:
+            cur.execute(
+                f"INSERT INTO {INGESTED_FILES} (file_unique_id, update_id) VALUES (%s, %s) ON CONFLICT (file_unique_id) DO NOTHING",
+                (file_unique_id, update_id),
+            )
+            return cur.rowcount == 1
+
+    def get_period_totals(
+        conn: psycopg.Connection, period: str, exclude_categories: tuple[str, ...] = ()
+    ) -> "pd.Series":
+        """Total spending of every week or month holding transactions
+
+        :param period: One of ROLLUP_PERIODS
+        :return: Series indexed by period start
+        """
+        import pandas as pd
+
+        with conn.cursor() as cur:
+            cur.execute(
+                f"""SELECT period_start, sum(total) FROM {YONDER_ROLLUPS}
+                WHERE period = %s AND category <> ALL(%s)
+                GROUP BY period_start ORDER BY period_start""",
+                (period, list(exclude_categories)),
+            )
+            rows = cur.fetchall()
+
+        return pd.Series(
+            [total for _, total in rows],
+            index=pd.DatetimeIndex([start for start, _ in rows]),
+            name="amount_gbp",
+            dtype="float64",
+        )
+
+    def get_available_years(conn: psycopg.Connection) -> list[int]:
+        with conn.cursor() as cur:
+            cur.execute(
+                f"""SELECT DISTINCT date_trunc('year', period_start) FROM {YONDER_ROLLUPS}
+                WHERE period = 'month' ORDER BY 1"""
+            )
+            return [year.year for (year,) in cur.fetchall()]
+
+    def get_available_months(conn: psycopg.Connection, year: int) -> list[int]:
+        with conn.cursor() as cur:
+            cur.execute(
+                f"""SELECT DISTINCT date_trunc('month', period_start) FROM {YONDER_ROLLUPS}
+                WHERE period = 'month' AND period_start >= make_date(%(year)s, 1, 1)
+                    AND period_start < make_date(%(year)s + 1, 1, 1)
+                ORDER BY 1""",
+                {"year": year},
+            )
+            return [month.month for (month,) in cur.fetchall()]
+
+    def get_available_weeks(
+        conn: psycopg.Connection, year: int, month: int
+    ) -> list[datetime]:
+        """Start of every week beginning in the given month"""
+        with conn.cursor() as cur:
+            cur.execute(
+                f"""SELECT DISTINCT date_trunc('week', period_start) FROM {YONDER_ROLLUPS}
+                WHERE period = 'week' AND period_start >= make_date(%(year)s, %(month)s, 1)
+                    AND period_start < make_date(%(year)s, %(month)s, 1) + interval '1 month'
+                ORDER BY 1""",
+                {"year": year, "month": month},
+            )
+            return [week for (week,) in cur.fetchall()]
@@ -1,32 +1,72 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, fields
+from functools import cached_property
 from typing import Hashable
 
+import numpy as np
 import pandas as pd
 
 
 class TransactionPeriod:
 
     def __init__(self, df: pd.DataFrame):
-        self.df = df
+        """
+        :param df: Transactions indexed by time. The frame is never modified.
+        """
+        self.df = df if df.index.is_monotonic_increasing else df.sort_index()
+
+    @cached_property
+    def _week_keys(self) -> np.ndarray:
+        """ISO year * 100 + ISO week of every row, ascending like the index"""
+        iso_calendar = self.df.index.isocalendar()
+        years = iso_calendar["year"].to_numpy(dtype="int64")
+        weeks = iso_calendar["week"].to_numpy(dtype="int64")
+        return years * 100 + weeks
+
+    @cached_property
+    def _month_keys(self) -> np.ndarray:
+        """Year * 100 + month of every row, ascending like the index"""
+        years = self.df.index.year.to_numpy(dtype="int64")
+        months = self.df.index.month.to_numpy(dtype="int64")
+        return years * 100 + months
+
+    def _rows_for_key(self, keys: np.ndarray, key: int) -> pd.DataFrame:
+        start, stop = np.searchsorted(keys, [key, key + 1])
+        return self.df.iloc[start:stop]
 
     def get_periodic_category_spending_df(self, frequency: str) -> pd.DataFrame:
         return (
-            self.df.groupby([pd.Grouper(freq=frequency), "category"])["amount_gbp"]
+            self.df.groupby([pd.Grouper(freq=frequency), "category"], observed=True)[
+                "amount_gbp"
+            ]
             .sum()
             .unstack(fill_value=0)
         )
 
-    def get_week_df(self, year: int, week_number: int) -> pd.DataFrame:
-        self.df.loc[:, "year"] = self.df.index.isocalendar().year
-        self.df.loc[:, "week"] = self.df.index.isocalendar().week
+    def get_category_spending_by_period(self, frequency: str) -> pd.DataFrame:
+        """Category spending of every period, indexed by period start like the
+        database rollups
 
-        specific_week_df = self.df[
-            (self.df["year"] == year) & (self.df["week"] == week_number)
-        ]
-        return specific_week_df
+        :param frequency: Period frequency such as "D", "W-SUN" (weeks starting on
+            Monday) or "M"
+        """
+        starts = self.df.index.to_period(frequency).start_time
+        return (
+            self.df.groupby(
+                [starts.rename("transaction_time"), "category"], observed=True
+            )["amount_gbp"]
+            .sum()
+            .unstack(fill_value=0)
+        )
+
+    def get_week_df(self, year: int, week_number: int) -> pd.DataFrame:
+        return self._rows_for_key(self._week_keys, year * 100 + week_number)
 
     def get_month_df(self, year_month: str) -> pd.DataFrame:
-        return self.df.loc[year_month]
+        year, month = map(int, year_month.split("-"))
+        month_df = self._rows_for_key(self._month_keys, year * 100 + month)
+        if month_df.empty:
+            raise KeyError(year_month)
+        return month_df
 
 
 class SpendingAnalysis:
@@ -45,7 +85,7 @@ class SpendingAnalysis:
 
     @staticmethod
     def get_top_expense_categories(df: pd.DataFrame) -> dict[Hashable, str]:
-        category_spending = df.groupby("category")["amount_gbp"].sum()
+        category_spending = df.groupby("category", observed=True)["amount_gbp"].sum()
         top_categories = category_spending.sort_values(ascending=False)
         top_categories_expense_amount = {
             category: f"£{amount:,.2f}"
@@ -70,6 +110,120 @@ class SpendingAnalysis:
 
         return difference
 
+    @staticmethod
+    def get_stats(
+        period_df: pd.DataFrame, totals: pd.Series, period: pd.Period
+    ) -> "Stats":
+        """Stats of one period, matching its row of get_period_stats
+
+        :param period_df: Transactions of the period
+        :param totals: Total spending of every period of the history, gaps as zero,
+            indexed by pd.Period
+        """
+        total_expense = SpendingAnalysis.get_total_expense(period_df)
+        previous_expense = totals.get(period - 1, total_expense)
+        if period_df.empty:
+            top_expense_amount, top_expense_description = float("nan"), None
+        else:
+            top_expense_amount, top_expense_description = (
+                SpendingAnalysis.get_top_expense_and_description(period_df)
+            )
+
+        return Stats(
+            average_expense=(
+                totals.iloc[1:-1].mean() if len(totals) > 2 else float("nan")
+            ),
+            total_expense=total_expense,
+            top_expense_amount=top_expense_amount,
+            top_expense_description=top_expense_description,
+            diff_between_two_periods=total_expense - previous_expense,
+            top_expense_categories=SpendingAnalysis.get_top_expense_categories(
+                period_df
+            ),
+        )
+
+    @staticmethod
+    def get_period_stats(df: pd.DataFrame, frequency: str) -> pd.DataFrame:
+        """Compute the Stats of every period in one pass over the transactions
+
+        Totals, top expenses and category rankings come from NumPy reductions
+        over integer period codes (bincount, reduceat) rather than one scan per
+        statistic, so the cost is linear in the number of transactions.
+        Periods without transactions inside the history are included with a
+        zero total. The first period's diff is zero, as there is nothing older to
+        compare it with.
+
+        :param df: Transactions indexed by time
+        :param frequency: Period frequency such as "W" or "M"
+        :return: One row per pd.Period, with columns named after the Stats fields
+        """
+        columns = [field.name for field in fields(Stats)]
+        if df.empty:
+            return pd.DataFrame(
+                columns=columns, index=pd.PeriodIndex([], freq=frequency)
+            )
+
+        if not df.index.is_monotonic_increasing:
+            df = df.sort_index()
+
+        periods = df.index.to_period(frequency)
+        all_periods = pd.period_range(periods[0], periods[-1], freq=frequency)
+        codes = periods.asi8 - all_periods[0].ordinal
+        amounts = df["amount_gbp"].to_numpy(dtype="float64")
+
+        totals = np.bincount(codes, weights=amounts, minlength=len(all_periods))
+
+        # Rows are sorted by time, so each period is a contiguous run of codes
+        starts = np.flatnonzero(np.diff(codes, prepend=-1))
+        run_codes = codes[starts]
+        run_maxima = np.maximum.reduceat(amounts, starts)
+        # First row of each run holding the run's maximum, like idxmax
+        is_max = amounts == np.repeat(run_maxima, np.diff(starts, append=len(codes)))
+        max_rows = np.flatnonzero(is_max)
+        top_rows = max_rows[np.unique(codes[max_rows], return_index=True)[1]]
+
+        top_expense_amount = np.full(len(all_periods), np.nan)
+        top_expense_amount[run_codes] = run_maxima
+        top_expense_description = np.full(len(all_periods), None, dtype=object)
+        top_expense_description[run_codes] = (
+            df["description"].iloc[top_rows].to_numpy(dtype=object)
+        )
+
+        # (period, category) totals as a small periods x categories matrix
+        category_codes, categories = pd.factorize(df["category"])
+        categorised = category_codes >= 0
+        cells = codes[categorised] * len(categories) + category_codes[categorised]
+        shape = (len(all_periods), len(categories))
+        category_totals = np.bincount(
+            cells, weights=amounts[categorised], minlength=shape[0] * shape[1]
+        ).reshape(shape)
+        category_counts = np.bincount(cells, minlength=shape[0] * shape[1]).reshape(
+            shape
+        )
+        ranking = np.argsort(-category_totals, axis=1, kind="stable")[:, :5]
+
+        top_expense_categories = [
+            {
+                categories[category]: f"£{category_totals[code, category]:,.2f}"
+                for category in ranking[code]
+                if category_counts[code, category]
+            }
+            for code in range(len(all_periods))
+        ]
+
+        stats = pd.DataFrame(
+            {
+                "average_expense": totals[1:-1].mean() if len(totals) > 2 else np.nan,
+                "total_expense": totals,
+                "top_expense_amount": top_expense_amount,
+                "top_expense_description": top_expense_description,
+                "diff_between_two_periods": np.diff(totals, prepend=totals[0]),
+                "top_expense_categories": top_expense_categories,
+            },
+            index=all_periods,
+        )
+        return stats[columns]
+
 
 @dataclass
 class Stats:
@@ -0,0 +1,257 @@
+import csv
+import io
+import itertools
+import multiprocessing
+import os
+import zipfile
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Iterable, Iterator
+
+from loguru import logger
+
+from personal_dashboard.backend.database import YONDER_COLUMNS, parse_transaction_rows
+from personal_dashboard.backend.timing import timed
+
+ARCHIVE_MIME_TYPES = ("application/zip", "application/x-zip-compressed")
+MAX_WORKERS = int(os.getenv("IMPORT_MAX_WORKERS", os.cpu_count() or 1))
+
+
+class UnknownLayoutError(ValueError):
+    pass
+
+
+class StatementParser(ABC):
+    """Turns the rows of one bank's CSV export into YONDER_COLUMNS tuples
+
+    Subclasses list the header columns that identify their layout and are picked
+    up by detect_parser once decorated with register_parser.
+    """
+
+    name: str
+    header: tuple[str, ...]
+
+    def matches(self, header: list[str]) -> bool:
+        return set(self.header) <= set(header)
+
+    @abstractmethod
+    def parse(self, header: list[str], rows: Iterator[list[str]]) -> Iterator[tuple]:
+        """Tuples ordered as YONDER_COLUMNS from the data rows following header"""
+
+
+PARSERS: list[StatementParser] = []
+
+
+def register_parser(parser: type[StatementParser]) -> type[StatementParser]:
+    PARSERS.append(parser())
+    return parser
+
+
+def detect_parser(header: list[str]) -> StatementParser:
+    """Parser of the layout whose columns header lists
+
+    Headers of as many columns as Yonder's that match no layout are still read
+    as Yonder exports by position, as they were before layouts were detected.
+    """
+    for parser in PARSERS:
+        if parser.matches(header):
+            return parser
+    if len(header) == len(YonderParser.header):
+        logger.warning(f"Unrecognised header {header}, reading it as Yonder's")
+        return next(parser for parser in PARSERS if isinstance(parser, YonderParser))
+    raise UnknownLayoutError(f"Unrecognised statement header: {header}")
+
+
+def title_category(category: str) -> str:
+    """Bank category spelt like Yonder's, e.g. eating_out -> Eating Out"""
+    return category.replace("_", " ").strip().title()
+
+
+def sequence_times(dates: Iterable[datetime]) -> Iterator[datetime]:
+    """Spread rows sharing a timestamp one second apart, in file order
+
+    Keeps rows of layouts that only carry a date in file order. The offsets are
+    deterministic, so re-importing a statement still matches the content hashes
+    of the rows loaded the first time.
+    """
+    for date, group in itertools.groupby(dates):
+        for offset, _ in enumerate(group):
+            yield date + timedelta(seconds=offset)
+
+
+@register_parser
+class YonderParser(StatementParser):
+    name = "Yonder"
+    header = (
+        "Date/Time of transaction",
+        "Description",
+        "Amount (GBP)",
+        "Amount (in Charged Currency)",
+        "Currency",
+        "Category",
+        "Debit or Credit",
+        "Postcode",
+    )
+
+    def matches(self, header: list[str]) -> bool:
+        return header[: len(self.header)] == list(self.header)
+
+    def parse(self, header: list[str], rows: Iterator[list[str]]) -> Iterator[tuple]:
+        return parse_transaction_rows(itertools.chain([header], rows))
+
+
+@register_parser
+class MonzoParser(StatementParser):
+    name = "Monzo"
+    header = (
+        "Transaction ID",
+        "Date",
+        "Time",
+        "Name",
+        "Category",
+        "Amount",
+        "Local amount",
+        "Local currency",
+    )
+
+    def parse(self, header: list[str], rows: Iterator[list[str]]) -> Iterator[tuple]:
+        column = {name: header.index(name) for name in self.header}
+        for row in rows:
+            amount = float(row[column["Amount"]])
+            transaction_time = datetime.strptime(
+                f"{row[column['Date']]} {row[column['Time']]}", "%d/%m/%Y %H:%M:%S"
+            )
+            yield (
+                transaction_time.strftime("%Y-%m-%d %H:%M:%S"),
+                row[column["Name"]],
+                abs(amount),
+                abs(float(row[column["Local amount"]])),
+                row[column["Local currency"]],
+                title_category(row[column["Category"]]),
+                "Debit" if amount < 0 else "Credit",
+                "",
+            )
+
+
+@register_parser
+class StarlingParser(StatementParser):
+    name = "Starling"
+    header = ("Date", "Counter Party", "Amount (GBP)", "Spending Category")
+
+    def parse(self, header: list[str], rows: Iterator[list[str]]) -> Iterator[tuple]:
+        column = {name: header.index(name) for name in self.header}
+        rows = list(rows)
+        dates = (datetime.strptime(row[column["Date"]], "%d/%m/%Y") for row in rows)
+        for row, transaction_time in zip(rows, sequence_times(dates)):
+            amount = float(row[column["Amount (GBP)"]])
+            yield (
+                transaction_time.strftime("%Y-%m-%d %H:%M:%S"),
+                row[column["Counter Party"]],
+                abs(amount),
+                abs(amount),
+                "GBP",
+                title_category(row[column["Spending Category"]]),
+                "Debit" if amount < 0 else "Credit",
+                "",
+            )
+
+
+def parse_rows(csv_rows: Iterable[list[str]]) -> Iterator[tuple]:
+    """Parse a CSV export of any registered layout, detected from its header
+
+    :param csv_rows: Rows from csv.reader, including the header row
+    :return: Generator of tuples ordered as YONDER_COLUMNS
+    """
+    rows = iter(csv_rows)
+    header = next(rows, None)
+    if header is None:
+        return
+    # Streamed exports keep the byte order mark that utf-8-sig would drop
+    header = [column.lstrip("\ufeff").strip() for column in header]
+    yield from detect_parser(header).parse(header, rows)
+
+
+@dataclass
+class TransactionBatch:
+    """Parsed transactions held column by column, in YONDER_COLUMNS order"""
+
+    columns: dict[str, list] = field(
+        default_factory=lambda: {column: [] for column in YONDER_COLUMNS}
+    )
+
+    def __len__(self) -> int:
+        return len(self.columns[YONDER_COLUMNS[0]])
+
+    def extend_rows(self, rows: Iterable[tuple]):
+        for values, new_values in zip(self.columns.values(), zip(*rows)):
+            values.extend(new_values)
+
+    def extend(self, other: "TransactionBatch"):
+        for column, values in self.columns.items():
+            values.extend(other.columns[column])
+
+    def rows(self) -> Iterator[tuple]:
+        return zip(*self.columns.values())
+
+
+def is_archive(name: str, data: bytes) -> bool:
+    return name.lower().endswith(".zip") or zipfile.is_zipfile(io.BytesIO(data))
+
+
+def expand_archives(files: Iterable[tuple[str, bytes]]) -> list[tuple[str, bytes]]:
+    """Replace every zip archive by the CSV statements it contains"""
+    statements = []
+    for name, data in files:
+        if not is_archive(name, data):
+            statements.append((name, data))
+            continue
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            for member in archive.infolist():
+                if not member.is_dir() and member.filename.lower().endswith(".csv"):
+                    statements.append(
+                        (f"{name}/{member.filename}", archive.read(member))
+                    )
+    return statements
+
+
+def parse_statement(name: str, data: bytes) -> TransactionBatch:
+    """Parse one CSV statement, run in a worker process by parse_statements"""
+    batch = TransactionBatch()
+    text = io.StringIO(data.decode("utf-8-sig"), newline="")
+    try:
+        batch.extend_rows(parse_rows(csv.reader(text)))
+    except (UnknownLayoutError, ValueError, IndexError) as e:
+        raise ValueError(f"Could not parse {name}: {e}") from e
+    return batch
+
+
+@timed("importers.parse_statements")
+def parse_statements(
+    files: Iterable[tuple[str, bytes]], max_workers: int = MAX_WORKERS
+) -> TransactionBatch:
+    """Parse CSV statements and zip archives of them into a single batch
+
+    Statements are parsed in parallel, one per worker process, when there is
+    more than one.
+
+    :param files: (file name, contents) pairs
+    """
+    statements = expand_archives(files)
+    batch = TransactionBatch()
+    workers = min(max_workers, len(statements))
+
+    if workers <= 1:
+        for name, data in statements:
+            batch.extend(parse_statement(name, data))
+    else:
+        # Spawned workers do not inherit the pool's threads or connections
+        with ProcessPoolExecutor(
+            workers, mp_context=multiprocessing.get_context("spawn")
+        ) as executor:
+            for statement in executor.map(parse_statement, *zip(*statements)):
+                batch.extend(statement)
+
+    logger.info(f"Parsed {len(batch)} transactions from {len(statements)} statements")
+    return batch
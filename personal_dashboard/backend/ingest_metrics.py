@@ -0,0 +1,167 @@
+"""Throughput and latency of the Telegram webhooks' ingests
+
+Each update is measured by one IngestMetrics: the time spent in every stage,
+bytes downloaded, rows parsed and rows inserted or skipped. emit logs it as one
+structured loguru record, like timing.record_spans, and adds it to the
+process-wide INGEST_COUNTERS. Those render in the Prometheus text format. They
+are kept per instance, so a scrape only sees the updates its instance served.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator, TypeVar
+
+from loguru import logger
+
+# Serve INGEST_COUNTERS on GET .../metrics of the webhooks when set to 1
+METRICS_ENDPOINT = os.getenv("WEBHOOK_METRICS_ENDPOINT", "") == "1"
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+T = TypeVar("T")
+
+
+@dataclass
+class IngestMetrics:
+    """Measurements of one update, filled in as it is processed
+
+    Stage times are exclusive: a stage entered inside another, e.g. "download"
+    while "upsert" pulls the rows it writes, pauses the outer one. The stages
+    of a streamed file thus add up to its wall time even though they overlap.
+    """
+
+    update_id: int | None = None
+    file_name: str | None = None
+    # ok, failed, rejected, duplicate or busy (async webhook queue full)
+    status: str = "ok"
+    bytes_downloaded: int = 0
+    rows: int = 0
+    inserted: int = 0
+    skipped: int = 0
+    stage_seconds: Counter = field(default_factory=Counter)
+    start: float = field(default_factory=time.perf_counter)
+    _stage: str | None = None
+    _since: float = 0.0
+
+    def _switch(self, stage: str | None) -> str | None:
+        """Charge the time since the last switch to the current stage"""
+        now = time.perf_counter()
+        previous = self._stage
+        if previous is not None:
+            self.stage_seconds[previous] += now - self._since
+        self._stage, self._since = stage, now
+        return previous
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Time the block as the named stage"""
+        previous = self._switch(name)
+        try:
+            yield
+        finally:
+            self._switch(previous)
+
+    def metered(
+        self, items: Iterable[T], stage: str, count_rows: bool = False
+    ) -> Iterator[T]:
+        """Time spent producing each item as the named stage
+
+        :param count_rows: Count every item in rows
+        """
+        items = iter(items)
+        while True:
+            previous = self._switch(stage)
+            try:
+                item = next(items)
+            except StopIteration:
+                return
+            finally:
+                self._switch(previous)
+            if count_rows:
+                self.rows += 1
+            yield item
+
+    def as_record(self) -> dict:
+        duration = time.perf_counter() - self.start
+        return {
+            "update_id": self.update_id,
+            "file_name": self.file_name,
+            "status": self.status,
+            "duration_ms": round(duration * 1000, 3),
+            "stage_ms": {
+                stage: round(seconds * 1000, 3)
+                for stage, seconds in self.stage_seconds.items()
+            },
+            "bytes_downloaded": self.bytes_downloaded,
+            "rows": self.rows,
+            "inserted": self.inserted,
+            "skipped": self.skipped,
+            "rows_per_second": round(self.rows / duration, 1) if duration else None,
+        }
+
+    def emit(self):
+        """Log the update's metrics as JSON and add them to INGEST_COUNTERS"""
+        record = self.as_record()
+        INGEST_COUNTERS.add(record)
+        logger.bind(ingest=record).info(f"Ingest metrics {json.dumps(record)}")
+
+
+class IngestCounters:
+    """Totals of every update emitted by this process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.updates = Counter()
+        self.totals = Counter()
+        self.stage_seconds = Counter()
+        self.duration_seconds = 0.0
+
+    def add(self, record: dict):
+        with self._lock:
+            self.updates[record["status"]] += 1
+            for name in ("bytes_downloaded", "rows", "inserted", "skipped"):
+                self.totals[name] += record[name]
+            for stage, milliseconds in record["stage_ms"].items():
+                self.stage_seconds[stage] += milliseconds / 1000
+            self.duration_seconds += record["duration_ms"] / 1000
+
+    def render(self) -> str:
+        """The counters in the Prometheus text exposition format"""
+        with self._lock:
+            lines = [
+                "# HELP telegram_ingest_updates_total Updates received, by outcome",
+                "# TYPE telegram_ingest_updates_total counter",
+                *(
+                    f'telegram_ingest_updates_total{{status="{status}"}} {count}'
+                    for status, count in sorted(self.updates.items())
+                ),
+                "# HELP telegram_ingest_duration_seconds Time spent per update",
+                "# TYPE telegram_ingest_duration_seconds summary",
+                f"telegram_ingest_duration_seconds_sum {self.duration_seconds:.6f}",
+                f"telegram_ingest_duration_seconds_count {self.updates.total()}",
+                "# HELP telegram_ingest_stage_seconds_total Time spent in each stage",
+                "# TYPE telegram_ingest_stage_seconds_total counter",
+                *(
+                    f'telegram_ingest_stage_seconds_total{{stage="{stage}"}} {seconds:.6f}'
+                    for stage, seconds in sorted(self.stage_seconds.items())
+                ),
+            ]
+            for name, help_text in (
+                ("bytes_downloaded", "Bytes of files downloaded from Telegram"),
+                ("rows", "Transaction rows parsed"),
+                ("inserted", "Transactions inserted"),
+                ("skipped", "Transactions skipped as already stored"),
+            ):
+                lines += [
+                    f"# HELP telegram_ingest_{name}_total {help_text}",
+                    f"# TYPE telegram_ingest_{name}_total counter",
+                    f"telegram_ingest_{name}_total {self.totals[name]}",
+                ]
+        return "\n".join(lines) + "\n"
+
+
+INGEST_COUNTERS = IngestCounters()
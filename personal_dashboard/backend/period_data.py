@@ -0,0 +1,49 @@
+from datetime import datetime
+from typing import Protocol
+
+import pandas as pd
+
+from personal_dashboard.backend.financial_analysis import Stats
+from personal_dashboard.backend.rolling_analysis import RollingSpending
+
+
+class PeriodData(Protocol):
+    """What the dashboard's week, month and search views read
+
+    Implemented by AnalyticsView, serving every view from memory, and by
+    PeriodQueries, fetching what each view needs from the database. Results
+    are shared between sessions and must not be modified.
+    """
+
+    # Identifies the data, for keying the figures derived from it
+    version: tuple
+
+    def get_period_df(self, chosen_datetime: datetime, frequency: str) -> pd.DataFrame:
+        """Transactions of the week ("W") or month ("M") holding chosen_datetime"""
+        ...
+
+    def get_stats(self, chosen_datetime: datetime, frequency: str) -> Stats: ...
+
+    def get_category_totals(
+        self, chosen_datetime: datetime, frequency: str
+    ) -> pd.Series:
+        """Spending per category of the period, the data of the pie chart"""
+        ...
+
+    def get_category_spending_each_period(self, rollup_period: str) -> pd.DataFrame:
+        """Category spending per "day", "week" or "month", indexed by period start"""
+        ...
+
+    def get_rolling_spending(self) -> RollingSpending: ...
+
+    def search(self, text: str) -> pd.DataFrame:
+        """Transactions whose description contains every word of text"""
+        ...
+
+    def get_available_years(self) -> list[int]: ...
+
+    def get_available_months(self, year: int) -> list[int]: ...
+
+    def get_available_weeks(self, year: int, month: int) -> list[datetime]:
+        """Start of every week beginning in the given month"""
+        ...
@@ -0,0 +1,191 @@
+"""Stats and category totals of every week and month, precomputed after a load
+
+AnalyticsService.start_precompute runs precompute_period_views on a background
+thread, so sessions are served while it runs and read each view from the
+PeriodViewCache once it is done. Histories with at least MIN_ROWS_PER_WORKER
+transactions per worker are split across a pool of worker processes, smaller
+ones are computed on that background thread.
+"""
+
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, replace
+from typing import Callable, Hashable
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from personal_dashboard.backend.financial_analysis import SpendingAnalysis, Stats
+from personal_dashboard.backend.timing import timed
+
+MAX_WORKERS = int(os.getenv("PRECOMPUTE_MAX_WORKERS", os.cpu_count() or 1))
+PERIOD_CACHE_ENTRIES = int(os.getenv("PERIOD_CACHE_ENTRIES", 4096))
+# Spawning the pool and pickling its chunks costs seconds, while computing in
+# the thread takes about 0.5s per million transactions, so each worker needs a
+# large share of the history to pay for itself
+MIN_ROWS_PER_WORKER = int(os.getenv("PRECOMPUTE_MIN_ROWS_PER_WORKER", 1_000_000))
+
+
+@dataclass(frozen=True)
+class PeriodView:
+    """What a week or month view shows besides the period's transactions"""
+
+    stats: Stats
+    # Spending per category, the data of the category pie chart
+    category_totals: pd.Series
+
+
+class PeriodViewCache:
+    """Thread-safe mapping of keys to PeriodViews, evicting the least recently used
+
+    :param max_entries: Entries kept before the least recently used is evicted
+    """
+
+    def __init__(self, max_entries: int = PERIOD_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[Hashable, PeriodView] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> PeriodView | None:
+        with self._lock:
+            view = self._entries.get(key)
+            if view is not None:
+                self._entries.move_to_end(key)
+            return view
+
+    def put(self, key: Hashable, view: PeriodView):
+        with self._lock:
+            self._entries[key] = view
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], PeriodView]):
+        view = self.get(key)
+        if view is None:
+            view = compute()
+            self.put(key, view)
+        return view
+
+
+def get_category_totals(period_df: pd.DataFrame) -> pd.Series:
+    return period_df.groupby("category", observed=True)["amount_gbp"].sum()
+
+
+def compute_period_views(
+    df: pd.DataFrame, frequency: str
+) -> dict[pd.Period, PeriodView]:
+    """PeriodViews of every period of df, run by each precompute worker
+
+    Averages and diffs only cover the periods of df, precompute_period_views
+    corrects them across chunks.
+    """
+    stats = SpendingAnalysis.get_period_stats(df, frequency)
+    category_totals = df.groupby(
+        [df.index.to_period(frequency), "category"], observed=True
+    )["amount_gbp"].sum()
+    empty = pd.Series(dtype="float64", name="amount_gbp")
+
+    totals_of_period = {
+        period: totals.droplevel(0)
+        for period, totals in category_totals.groupby(level=0, observed=True)
+    }
+    return {
+        period: PeriodView(
+            stats=Stats(**row), category_totals=totals_of_period.get(period, empty)
+        )
+        for period, row in zip(stats.index, stats.to_dict("records"))
+    }
+
+
+def split_periods(df: pd.DataFrame, frequency: str, chunks: int) -> list[pd.DataFrame]:
+    """Split df into up to chunks contiguous frames, never splitting a period"""
+    codes = df.index.to_period(frequency).asi8
+    bounds = np.searchsorted(
+        codes, codes[np.linspace(0, len(codes), chunks, endpoint=False, dtype="int64")]
+    )
+    bounds = np.unique(np.append(bounds, len(codes)))
+    return [df.iloc[start:stop] for start, stop in zip(bounds[:-1], bounds[1:])]
+
+
+@timed("precompute_period_views")
+def precompute_period_views(
+    df: pd.DataFrame,
+    frequencies: tuple[str, ...] = ("W", "M"),
+    max_workers: int = MAX_WORKERS,
+    min_rows_per_worker: int = MIN_ROWS_PER_WORKER,
+) -> dict[tuple[str, pd.Period], PeriodView]:
+    """PeriodViews of every week and month of the history, in a process pool
+
+    The history is split into chunks of whole periods, one per worker and
+    frequency, with at least min_rows_per_worker transactions in each. Averages
+    and diffs depend on every period, so they are recomputed from the totals of
+    all chunks once the workers are done.
+
+    :param df: Transactions indexed by time in ascending order
+    :return: PeriodViews keyed by (frequency, period), every period from the first
+        to the last included
+    """
+    if df.empty:
+        return {}
+
+    chunks = max(1, min(max_workers, len(df) // min_rows_per_worker))
+    jobs = [
+        (chunk, frequency)
+        for frequency in frequencies
+        for chunk in split_periods(df, frequency, chunks)
+    ]
+    if chunks <= 1:
+        results = [compute_period_views(chunk, frequency) for chunk, frequency in jobs]
+    else:
+        # Spawned workers do not inherit the pool's threads or connections
+        with ProcessPoolExecutor(
+            min(max_workers, len(jobs)), mp_context=multiprocessing.get_context("spawn")
+        ) as executor:
+            results = list(executor.map(compute_period_views, *zip(*jobs)))
+
+    views = {}
+    for (_, frequency), chunk_views in zip(jobs, results):
+        for period, view in chunk_views.items():
+            views[frequency, period] = view
+
+    for frequency in frequencies:
+        periods = df.index[[0, -1]].to_period(frequency)
+        all_periods = pd.period_range(periods[0], periods[1], freq=frequency)
+        empty = PeriodView(
+            stats=Stats(
+                average_expense=np.nan,
+                total_expense=0.0,
+                top_expense_amount=np.nan,
+                top_expense_description=None,
+                diff_between_two_periods=0.0,
+                top_expense_categories={},
+            ),
+            category_totals=pd.Series(dtype="float64", name="amount_gbp"),
+        )
+        totals = np.array(
+            [
+                views.get((frequency, period), empty).stats.total_expense
+                for period in all_periods
+            ]
+        )
+        average = totals[1:-1].mean() if len(totals) > 2 else np.nan
+        diffs = np.diff(totals, prepend=totals[0])
+        for period, diff in zip(all_periods, diffs):
+            view = views.get((frequency, period), empty)
+            views[frequency, period] = replace(
+                view,
+                stats=replace(
+                    view.stats, average_expense=average, diff_between_two_periods=diff
+                ),
+            )
+
+    logger.info(f"Precomputed {len(views)} period views from {len(jobs)} chunks")
+    return views
@@ -0,0 +1,146 @@
+import threading
+from datetime import datetime
+from typing import Callable
+
+import pandas as pd
+
+from personal_dashboard.backend.database import SqlConnections
+from personal_dashboard.backend.financial_analysis import SpendingAnalysis, Stats
+from personal_dashboard.backend.period_precompute import get_category_totals
+from personal_dashboard.backend.rolling_analysis import RollingSpending
+from personal_dashboard.backend.timing import timed
+
+ROLLUP_PERIOD_OF_FREQUENCY = {"W": "week", "M": "month"}
+
+
+class PeriodQueries:
+    """Fetch only what one week or month view needs from the database
+
+    Results are memoised per instance and never modified, so one instance per
+    data version can be shared by every session. Searches are not memoised, as
+    their texts are unbounded. Serves the dashboard as a PeriodData.
+
+    :param version: Data version the results belong to, e.g. from
+        SqlConnections.get_data_version
+    :param exclude_categories: Categories left out of every result
+    """
+
+    def __init__(self, version: tuple = (), exclude_categories: tuple[str, ...] = ()):
+        self.version = version
+        self.exclude_categories = tuple(exclude_categories)
+        self._results = {}
+        self._lock = threading.Lock()
+
+    def _memoised(self, key: tuple, compute: Callable):
+        with self._lock:
+            if key in self._results:
+                return self._results[key]
+        result = compute()
+        with self._lock:
+            return self._results.setdefault(key, result)
+
+    @timed("PeriodQueries.get_period_df")
+    def get_period_df(self, chosen_datetime: datetime, frequency: str) -> pd.DataFrame:
+        """Transactions of the week ("W") or month ("M") holding chosen_datetime"""
+        period = pd.Period(chosen_datetime, frequency)
+
+        def compute():
+            with SqlConnections.connection() as conn:
+                return SqlConnections.get_transactions_between(
+                    conn,
+                    period.start_time,
+                    (period + 1).start_time,
+                    self.exclude_categories,
+                )
+
+        return self._memoised(("period_df", period), compute)
+
+    @timed("PeriodQueries.get_period_totals")
+    def get_period_totals(self, frequency: str) -> pd.Series:
+        """Total spending of every period from the first to the last, gaps as zero"""
+
+        def compute():
+            with SqlConnections.connection() as conn:
+                totals = SqlConnections.get_period_totals(
+                    conn,
+                    ROLLUP_PERIOD_OF_FREQUENCY[frequency],
+                    self.exclude_categories,
+                )
+            totals.index = totals.index.to_period(frequency)
+            if totals.empty:
+                return totals
+            return totals.reindex(
+                pd.period_range(totals.index[0], totals.index[-1], freq=frequency),
+                fill_value=0.0,
+            )
+
+        return self._memoised(("period_totals", frequency), compute)
+
+    @timed("PeriodQueries.get_category_spending_each_period")
+    def get_category_spending_each_period(self, rollup_period: str) -> pd.DataFrame:
+        """Category spending per period for the stacked bar, from the rollups"""
+
+        def compute():
+            with SqlConnections.connection() as conn:
+                rollup = SqlConnections.get_period_rollups(conn, rollup_period)
+            return rollup.drop(columns=list(self.exclude_categories), errors="ignore")
+
+        return self._memoised(("category_spending", rollup_period), compute)
+
+    @timed("PeriodQueries.get_rolling_spending")
+    def get_rolling_spending(self) -> RollingSpending:
+        """Prefix sums over the daily rollups, for rolling and year to date totals"""
+        return self._memoised(
+            ("rolling_spending",),
+            lambda: RollingSpending(self.get_category_spending_each_period("day")),
+        )
+
+    @timed("PeriodQueries.search")
+    def search(self, text: str) -> pd.DataFrame:
+        """Transactions whose description contains every word of text"""
+
+        with SqlConnections.connection() as conn:
+            return SqlConnections.search_transactions(
+                conn, text, self.exclude_categories
+            )
+
+    @timed("PeriodQueries.get_stats")
+    def get_stats(self, chosen_datetime: datetime, frequency: str) -> Stats:
+        """Stats of the chosen period, matching SpendingAnalysis.get_period_stats"""
+        period = pd.Period(chosen_datetime, frequency)
+        period_df = self.get_period_df(chosen_datetime, frequency)
+        totals = self.get_period_totals(frequency)
+
+        return SpendingAnalysis.get_stats(period_df, totals, period)
+
+    def get_category_totals(
+        self, chosen_datetime: datetime, frequency: str
+    ) -> pd.Series:
+        period = pd.Period(chosen_datetime, frequency)
+        return self._memoised(
+            ("category_totals", period),
+            lambda: get_category_totals(
+                self.get_period_df(chosen_datetime, frequency)
+            ),
+        )
+
+    def get_available_years(self) -> list[int]:
+        def compute():
+            with SqlConnections.connection() as conn:
+                return SqlConnections.get_available_years(conn)
+
+        return self._memoised(("years",), compute)
+
+    def get_available_months(self, year: int) -> list[int]:
+        def compute():
+            with SqlConnections.connection() as conn:
+                return SqlConnections.get_available_months(conn, year)
+
+        return self._memoised(("months", year), compute)
+
+    def get_available_weeks(self, year: int, month: int) -> list[datetime]:
+        def compute():
+            with SqlConnections.connection() as conn:
+                return SqlConnections.get_available_weeks(conn, year, month)
+
+        return self._memoised(("weeks", year, month), compute)
@@ -0,0 +1,118 @@
+from dataclasses import dataclass
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+
+@dataclass
+class RollingStats:
+    window_days: int
+    moving_average: float
+    moving_average_change: float
+    year_to_date: float
+    year_to_date_change: float
+
+
+class RollingSpending:
+    """Prefix sums of daily spending per category, for O(1) range totals
+
+    Row i of the prefix sums holds the spending of every day before day i, so the
+    total of any run of days is the difference of two rows whatever its length.
+    Amounts are summed as whole pennies, which keeps the differences exact.
+    """
+
+    def __init__(self, daily: pd.DataFrame):
+        """
+        :param daily: Spending per day with one column per category, e.g. the
+            "day" rollups. Missing days count as zero.
+        """
+        self.categories = list(daily.columns)
+        if daily.empty:
+            self.first_day = pd.Timestamp(0)
+            self.days = 0
+        else:
+            daily = daily.sort_index()
+            self.first_day = daily.index[0].normalize()
+            self.days = (daily.index[-1].normalize() - self.first_day).days + 1
+
+        pennies = np.zeros((self.days, len(self.categories)), dtype="int64")
+        if self.days:
+            rows = (daily.index.normalize() - self.first_day).days.to_numpy()
+            np.add.at(
+                pennies,
+                rows,
+                np.rint(daily.to_numpy(dtype="float64") * 100).astype("int64"),
+            )
+
+        self._prefix = np.zeros((self.days + 1, len(self.categories)), dtype="int64")
+        np.cumsum(pennies, axis=0, out=self._prefix[1:])
+        self._total_prefix = self._prefix.sum(axis=1)
+
+    @property
+    def last_day(self) -> pd.Timestamp:
+        return self.first_day + pd.Timedelta(days=self.days - 1)
+
+    def _row(self, day: datetime) -> int:
+        """Prefix row of the start of day, clipped to the grid"""
+        offset = (pd.Timestamp(day).normalize() - self.first_day).days
+        return min(max(offset, 0), self.days)
+
+    def total(
+        self, start: datetime, end: datetime, category: str | None = None
+    ) -> float:
+        """Spending from the start of day start to the end of day end
+
+        :param category: Only count this category, every category when None
+        """
+        first, last = self._row(start), self._row(end + pd.Timedelta(days=1))
+        if category is None:
+            pennies = self._total_prefix[last] - self._total_prefix[first]
+        elif category in self.categories:
+            column = self.categories.index(category)
+            pennies = self._prefix[last, column] - self._prefix[first, column]
+        else:
+            pennies = 0
+        return pennies / 100
+
+    def rolling_total(
+        self, end: datetime, days: int, category: str | None = None
+    ) -> float:
+        """Spending of the window of days ending with day end"""
+        return self.total(end - pd.Timedelta(days=days - 1), end, category)
+
+    def moving_average(
+        self, end: datetime, days: int, category: str | None = None
+    ) -> float:
+        """Average daily spending over the window of days ending with day end"""
+        return self.rolling_total(end, days, category) / days
+
+    def year_to_date(self, day: datetime, category: str | None = None) -> float:
+        """Spending from the 1st of January up to and including day"""
+        day = pd.Timestamp(day)
+        return self.total(day.replace(month=1, day=1), day, category)
+
+    def get_rolling_stats(self, day: datetime, window_days: int = 30) -> RollingStats:
+        """Moving average and year to date at day, each against the same span before
+
+        The moving average is compared with the window_days before its window, and
+        the year to date with the same days of the previous year.
+        """
+        day = pd.Timestamp(day).normalize()
+        moving_average = self.moving_average(day, window_days)
+        previous_average = self.moving_average(
+            day - pd.Timedelta(days=window_days), window_days
+        )
+
+        year_to_date = self.year_to_date(day)
+        # 29 February falls back to the 28th of the previous year
+        last_year = day - pd.DateOffset(years=1)
+        previous_year_to_date = self.year_to_date(last_year)
+
+        return RollingStats(
+            window_days=window_days,
+            moving_average=moving_average,
+            moving_average_change=moving_average - previous_average,
+            year_to_date=year_to_date,
+            year_to_date_change=year_to_date - previous_year_to_date,
+        )
@@ -0,0 +1,85 @@
+from functools import reduce
+
+import numpy as np
+import pandas as pd
+
+from personal_dashboard.backend.timing import timed
+
+
+def search_words(text: str) -> list[str]:
+    """Lowercase words of a search, every one of which must match"""
+    return text.lower().split()
+
+
+def trigrams(word: str) -> set[str]:
+    return {word[i : i + 3] for i in range(len(word) - 2)}
+
+
+class DescriptionIndex:
+    """Trigram inverted index over the distinct descriptions of a frame
+
+    Matches like the trigram index of SqlConnections.search_transactions: every
+    word of the search must appear in the description, ignoring case. Each
+    word's trigrams narrow the candidates to a few descriptions before the
+    substring check, and rows are found through their description code, so no
+    query scans the frame.
+    """
+
+    @timed("DescriptionIndex.__init__")
+    def __init__(self, df: pd.DataFrame):
+        """
+        :param df: Transactions to search. The frame is never modified.
+        """
+        self.df = df
+        codes, descriptions = pd.factorize(df["description"])
+        self.descriptions = [str(description).lower() for description in descriptions]
+
+        # Row positions grouped by description code, ascending within each code
+        described = np.flatnonzero(codes >= 0)
+        self._rows = described[np.argsort(codes[described], kind="stable")]
+        self._offsets = np.concatenate(
+            [[0], np.cumsum(np.bincount(codes[described], minlength=len(descriptions)))]
+        )
+
+        postings = {}
+        for code, description in enumerate(self.descriptions):
+            for gram in trigrams(description):
+                postings.setdefault(gram, []).append(code)
+        self._postings = {
+            gram: np.array(codes, dtype="int64") for gram, codes in postings.items()
+        }
+
+    def _match_word(self, word: str) -> np.ndarray:
+        grams = trigrams(word)
+        if grams:
+            empty = np.empty(0, dtype="int64")
+            candidates = reduce(
+                np.intersect1d, (self._postings.get(gram, empty) for gram in grams)
+            )
+        else:
+            # Words shorter than a trigram are checked against every description
+            candidates = np.arange(len(self.descriptions))
+        return np.array(
+            [code for code in candidates if word in self.descriptions[code]],
+            dtype="int64",
+        )
+
+    def match_descriptions(self, text: str) -> np.ndarray:
+        """Codes of the distinct descriptions matching every word of text"""
+        words = search_words(text)
+        if not words:
+            return np.empty(0, dtype="int64")
+        return reduce(np.intersect1d, (self._match_word(word) for word in words))
+
+    @timed("DescriptionIndex.search")
+    def search(self, text: str) -> pd.DataFrame:
+        """Transactions whose description matches every word of text, in time order"""
+        codes = self.match_descriptions(text)
+        rows = np.concatenate(
+            [[]]
+            + [
+                self._rows[self._offsets[code] : self._offsets[code + 1]]
+                for code in codes
+            ]
+        ).astype("int64")
+        return self.df.iloc[np.sort(rows)]
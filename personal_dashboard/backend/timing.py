@@ -0,0 +1,98 @@
+import functools
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Iterator
+
+from loguru import logger
+
+
+@dataclass
+class Span:
+    name: str
+    start: float
+    duration: float
+    depth: int
+
+
+@dataclass
+class _Recording:
+    run_id: str
+    origin: float
+    spans: list[Span]
+    depth: int = 0
+
+
+_recording: ContextVar[_Recording | None] = ContextVar("timing_recording", default=None)
+
+
+class timed:
+    """Time a block or a function as a named span of the current recording
+
+    Usable as ``with timed("name"):`` or as a ``@timed("name")`` decorator. Outside
+    of record_spans it only costs a context variable lookup.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __call__(self, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with timed(self.name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    def __enter__(self):
+        self._recording = _recording.get()
+        if self._recording is not None:
+            self._depth = self._recording.depth
+            self._recording.depth += 1
+            self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._recording is not None:
+            end = time.perf_counter()
+            self._recording.depth = self._depth
+            self._recording.spans.append(
+                Span(
+                    self.name,
+                    self._start - self._recording.origin,
+                    end - self._start,
+                    self._depth,
+                )
+            )
+        return False
+
+
+@contextmanager
+def record_spans(enabled: bool = True) -> Iterator[list[Span] | None]:
+    """Collect the spans timed inside the block, e.g. one dashboard rerun
+
+    Every span is also emitted as a structured loguru record carrying run_id,
+    span, depth, start_ms and duration_ms. When disabled nothing is recorded and
+    None is yielded.
+    """
+    if not enabled:
+        yield None
+        return
+
+    recording = _Recording(uuid.uuid4().hex, time.perf_counter(), [])
+    token = _recording.set(recording)
+    try:
+        yield recording.spans
+    finally:
+        _recording.reset(token)
+        recording.spans.sort(key=lambda span: span.start)
+        for span in recording.spans:
+            logger.bind(
+                run_id=recording.run_id,
+                span=span.name,
+                depth=span.depth,
+                start_ms=round(span.start * 1000, 3),
+                duration_ms=round(span.duration * 1000, 3),
+            ).info(f"{span.name} took {span.duration * 1000:.1f}ms")
@@ -0,0 +1,164 @@
+import threading
+import time
+from datetime import datetime
+
+import pandas as pd
+from loguru import logger
+
+from personal_dashboard.backend.database import SqlConnections
+from personal_dashboard.backend.timing import timed
+from personal_dashboard.backend.transaction_snapshot import TransactionSnapshot
+
+
+class TransactionCache:
+    """In-memory copy of the transactions table, topped up with new rows only
+
+    The cache is keyed on the newest transaction_time it holds. Each refresh
+    runs a max(transaction_time)/count(*) probe and then either does nothing,
+    fetches only the rows past the watermark, or falls back to a full fetch
+    when rows were added or removed behind the watermark.
+
+    Only a get without any data, and no usable snapshot, waits on the database.
+    Once data is held, from the snapshot or a first fetch, the database is only
+    probed by a background refresh, which also rewrites the snapshot whenever
+    the data changed.
+    """
+
+    def __init__(
+        self,
+        probe_interval: float = 60,
+        snapshot: TransactionSnapshot | None = None,
+    ):
+        """
+        :param probe_interval: Minimum number of seconds between database probes
+        :param snapshot: Optional local copy to start from and keep up to date
+        """
+        self.probe_interval = probe_interval
+        self.snapshot = snapshot
+        self.df: pd.DataFrame | None = None
+        self.watermark: datetime | None = None
+        self.row_count = 0
+        self._last_probe = float("-inf")
+        # Reentrant so the first fetch can refresh while holding it
+        self._lock = threading.RLock()
+        self._reconciler: threading.Thread | None = None
+
+    @property
+    def version(self) -> tuple[datetime | None, int]:
+        """Identifies the cached data, for keying results derived from it"""
+        return self.watermark, self.row_count
+
+    def get(self) -> pd.DataFrame:
+        """Return the cached transactions indexed by transaction_time
+
+        The returned frame is shared between sessions and must not be mutated.
+        """
+        return self.get_with_version()[0]
+
+    @timed("TransactionCache.get")
+    def get_with_version(self) -> tuple[pd.DataFrame, tuple[datetime | None, int]]:
+        """Return the cached transactions together with their version
+
+        Read at once, so a background refresh cannot pair the frame with the
+        version of newer data.
+        """
+        with self._lock:
+            if self.df is None and self.snapshot is not None:
+                loaded = self.snapshot.load()
+                if loaded is not None:
+                    self.df, self.watermark, self.row_count = loaded
+
+            if self.df is None:
+                with SqlConnections.connection() as conn:
+                    self.refresh(conn)
+                self._last_probe = time.monotonic()
+                if self.snapshot is not None:
+                    self._reconcile_in_background(write_only=True)
+            elif time.monotonic() - self._last_probe >= self.probe_interval:
+                self._last_probe = time.monotonic()
+                self._reconcile_in_background()
+            return self.df, self.version
+
+    def _reconcile_in_background(self, write_only=False):
+        """Bring the cached data up to date, then rewrite the snapshot if it changed
+
+        :param write_only: Only write the current data to the snapshot
+        """
+        if self._reconciler is not None and self._reconciler.is_alive():
+            return
+        self._reconciler = threading.Thread(
+            target=self._reconcile,
+            args=(write_only,),
+            name="transaction-snapshot",
+            daemon=True,
+        )
+        self._reconciler.start()
+
+    @timed("TransactionCache.reconcile")
+    def _reconcile(self, write_only: bool):
+        try:
+            if not write_only:
+                with SqlConnections.connection() as conn:
+                    changed = self.refresh(conn)
+                if not changed:
+                    return
+            if self.snapshot is None:
+                return
+            with self._lock:
+                df, watermark, row_count = self.df, self.watermark, self.row_count
+            self.snapshot.write(df, watermark, row_count)
+        except Exception as e:
+            logger.exception(f"Failed to refresh the transaction cache: {e}")
+
+    @timed("TransactionCache.refresh")
+    def refresh(self, conn) -> bool:
+        """Bring the cache up to date, returning whether its data changed
+
+        Fetches without holding the lock, then swaps the data in at once.
+        """
+        with self._lock:
+            df, cached_watermark, cached_row_count = (
+                self.df,
+                self.watermark,
+                self.row_count,
+            )
+        watermark, row_count = SqlConnections.get_transactions_watermark(conn)
+
+        if df is not None and (watermark, row_count) == (
+            cached_watermark,
+            cached_row_count,
+        ):
+            logger.debug(f"Transaction cache up to date at {watermark}")
+            return False
+
+        if df is not None and cached_watermark is not None and watermark is not None:
+            delta = SqlConnections.get_transactions_since(conn, cached_watermark)
+            if len(df) + len(delta) == row_count:
+                logger.info(
+                    f"Appending {len(delta)} transactions after {cached_watermark}"
+                )
+                df = TransactionCache.append(df, delta)
+                with self._lock:
+                    self.df, self.watermark, self.row_count = df, watermark, row_count
+                return True
+
+        logger.info(f"Fetching all {row_count} transactions")
+        df = SqlConnections.get_all_transactions_as_table(conn)
+        with self._lock:
+            self.df, self.watermark, self.row_count = df, watermark, row_count
+        return True
+
+    @staticmethod
+    def append(df: pd.DataFrame, delta: pd.DataFrame) -> pd.DataFrame:
+        """Concatenate without losing categorical dtypes
+
+        pd.concat falls back to object columns when the categories differ, so both
+        frames are first cast to the union of their categories.
+        """
+        dtypes = {
+            column: pd.CategoricalDtype(
+                df[column].cat.categories.union(delta[column].cat.categories)
+            )
+            for column in df.select_dtypes("category")
+        }
+        return pd.concat([df.astype(dtypes), delta.astype(dtypes)]).sort_index()
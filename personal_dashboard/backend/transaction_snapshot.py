@@ -0,0 +1,93 @@
+import json
+import os
+import tempfile
+from datetime import datetime
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from loguru import logger
+
+from personal_dashboard.backend.database import YONDER_DTYPES
+from personal_dashboard.backend.timing import timed
+
+# Bump whenever the columns or dtypes written to the snapshot change, so older
+# snapshots are rebuilt instead of being read with the wrong layout
+SCHEMA_VERSION = 1
+METADATA_KEY = b"personal_dashboard"
+
+SNAPSHOT_PATH = os.getenv(
+    "DASHBOARD_SNAPSHOT_PATH",
+    os.path.join(
+        os.getenv("HOME", "."), ".cache", "personal_dashboard", "transactions.parquet"
+    ),
+)
+
+
+class TransactionSnapshot:
+    """Local Parquet copy of the cached transactions, read without the database
+
+    The file records the schema version, watermark and row count of the data it
+    holds. A missing, unreadable or outdated file loads as None, which makes the
+    caller fall back to a full fetch that then rewrites it.
+    """
+
+    def __init__(self, path: str = SNAPSHOT_PATH):
+        self.path = path
+
+    @timed("TransactionSnapshot.load")
+    def load(self) -> tuple[pd.DataFrame, datetime | None, int] | None:
+        """Memory-map the snapshot and return its frame, watermark and row count"""
+        if not os.path.exists(self.path):
+            return None
+
+        try:
+            table = pq.read_table(self.path, memory_map=True)
+            metadata = json.loads(table.schema.metadata[METADATA_KEY])
+            if metadata["schema_version"] != SCHEMA_VERSION:
+                logger.info(
+                    f"Ignoring snapshot {self.path} with schema version "
+                    f"{metadata['schema_version']}, expected {SCHEMA_VERSION}"
+                )
+                return None
+
+            df = table.to_pandas().astype(YONDER_DTYPES)
+            row_count = metadata["row_count"]
+            if len(df) != row_count:
+                raise ValueError(f"Holds {len(df)} rows, expected {row_count}")
+        except (OSError, KeyError, TypeError, ValueError, pa.ArrowException) as e:
+            logger.warning(f"Ignoring unreadable snapshot {self.path}: {e}")
+            return None
+
+        watermark = metadata["watermark"]
+        if watermark is not None:
+            watermark = datetime.fromisoformat(watermark)
+        logger.info(f"Loaded {row_count} transactions up to {watermark} from snapshot")
+        return df, watermark, row_count
+
+    @timed("TransactionSnapshot.write")
+    def write(self, df: pd.DataFrame, watermark: datetime | None, row_count: int):
+        """Replace the snapshot atomically, so readers never see a partial file"""
+        table = pa.Table.from_pandas(df, preserve_index=True)
+        metadata = {
+            "schema_version": SCHEMA_VERSION,
+            "watermark": None if watermark is None else watermark.isoformat(),
+            "row_count": row_count,
+        }
+        table = table.replace_schema_metadata(
+            {**table.schema.metadata, METADATA_KEY: json.dumps(metadata)}
+        )
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".parquet.tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pq.write_table(table, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        logger.info(f"Wrote {row_count} transactions up to {watermark} to snapshot")
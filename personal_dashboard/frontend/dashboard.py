@@ -1,26 +1,34 @@
-from datetime import datetime as dt
+import os
 
 import pandas as pd
 import streamlit as st
 
+from personal_dashboard.backend.analytics_service import AnalyticsService
 from personal_dashboard.backend.authentication import authenticate
 from personal_dashboard.backend.database import SqlConnections
+from personal_dashboard.backend.period_data import PeriodData
+from personal_dashboard.backend.period_queries import PeriodQueries
+from personal_dashboard.backend.timing import record_spans, timed
+from personal_dashboard.backend.transaction_cache import TransactionCache
+from personal_dashboard.backend.transaction_snapshot import (
+    SNAPSHOT_PATH,
+    TransactionSnapshot,
+)
 from personal_dashboard.backend.utils import extract_first_date, get_day_suffix
+from personal_dashboard.frontend.figures import Figures
 from personal_dashboard.frontend.page_components import PageComponents
 
 
-def spending_period_filter(df: pd.DataFrame):
+def spending_period_filter(data: PeriodData):
     col1, col2, col3, col4 = st.columns(4)
     with col1:
-        available_years = df.index.year.unique().sort_values().tolist()
+        available_years = data.get_available_years()
         year = st.selectbox(
             "Year",
             available_years,
         )
     with col2:
-        available_months = reversed(
-            df[df.index.year == year].index.month.unique().sort_values().tolist()
-        )
+        available_months = reversed(data.get_available_months(year))
         month_names = [
             pd.to_datetime(f"2024-{month}-01").strftime("%B")
             for month in available_months
@@ -37,12 +45,15 @@ def spending_period_filter(df: pd.DataFrame):
         week = None
         if week_view_activated:
             month_number = pd.to_datetime(month, format="%B").month
-            df_weeks = df[(df.index.year == year) & (df.index.month == month_number)]
-            weeks = reversed(df_weeks.index.to_period("W").unique())
+            weeks = reversed(
+                [
+                    pd.Period(week_start, "W")
+                    for week_start in data.get_available_weeks(year, month_number)
+                ]
+            )
             week_start_dates = [
                 f"{week.start_time.day}{get_day_suffix(week.start_time.day)}-{week.end_time.day}{get_day_suffix(week.end_time.day)}"
                 for week in weeks
-                if week.start_time.month == month_number
             ]
             week = st.selectbox(
                 "Week",
@@ -53,12 +64,16 @@ def spending_period_filter(df: pd.DataFrame):
     return (year, month, week)
 
 
-def streamlit_app(df: pd.DataFrame, exclude_holiday=False):
+def streamlit_app(data: PeriodData, exclude_holiday=False):
+    """
+    :param data: Serves the period selectors and every view, matching
+        exclude_holiday
+    """
     if authenticate():
-        components = PageComponents(df, exclude_holiday)
-        tab1, tab2 = st.tabs([f"Spending Analysis", "Stats"])
+        components = PageComponents(data, exclude_holiday)
+        tab1, tab2, tab3 = st.tabs(["Spending Analysis", "Stats", "Search"])
         with tab1:
-            year, month, week = spending_period_filter(df)
+            year, month, week = spending_period_filter(data)
             beginning_date_from_week = extract_first_date(week)
             chosen_datetime = pd.to_datetime(
                 f"{year}-{month}-{beginning_date_from_week}", format="mixed"
@@ -67,22 +82,71 @@ def streamlit_app(df: pd.DataFrame, exclude_holiday=False):
                 components.weekly_view(chosen_datetime)
             else:
                 components.monthly_view(chosen_datetime)
+        with tab3:
+            text = st.text_input(
+                "Search descriptions", placeholder="Merchant or words to match"
+            )
+            components.search_view(text)
+
+
+@st.cache_resource
+def get_transaction_cache() -> TransactionCache:
+    # Setting DASHBOARD_SNAPSHOT_PATH to an empty string disables the snapshot
+    snapshot = TransactionSnapshot(SNAPSHOT_PATH) if SNAPSHOT_PATH else None
+    return TransactionCache(snapshot=snapshot)
+
+
+@st.cache_resource(max_entries=1)
+def get_analytics_service(_df: pd.DataFrame, version: tuple) -> AnalyticsService:
+    """Analytics shared read-only by every session, rebuilt when the data changes
 
+    Rollups are regrouped from the transactions rather than read from the
+    database, so a first paint from the snapshot only reads local disk. The
+    views of every week and month are precomputed in the background, so
+    navigating between periods is a lookup.
 
-@st.cache_data(ttl="1d")
-def get_transaction_df():
-    conn = SqlConnections.sql_connect()
-    transactions = SqlConnections.get_all_transactions_as_table(conn)
-    SqlConnections.sql_disconnect(conn)
-    return transactions
+    :param version: Version of the transaction cache
+    """
+    service = AnalyticsService(_df, version)
+    service.start_precompute()
+    return service
+
+
+@st.cache_data(ttl=60)
+def get_data_version() -> tuple:
+    """Cheap database probe, re-run at most once a minute"""
+    with SqlConnections.connection() as conn:
+        return SqlConnections.get_data_version(conn)
+
+
+@st.cache_resource(max_entries=2)
+def get_period_queries(version: tuple, exclude_holiday: bool) -> PeriodQueries:
+    """Period queries shared by every session until the data changes"""
+    return PeriodQueries(version, ("Holiday",) if exclude_holiday else ())
 
 
 if __name__ == "__main__":
     st.set_page_config(layout="wide")
-    transactions = get_transaction_df()
-    transactions.loc[:, "transaction_time"] = pd.to_datetime(
-        transactions["transaction_time"]
+    timing_enabled = (
+        os.getenv("DASHBOARD_TIMING") == "1" or st.query_params.get("timing") == "1"
     )
-    transactions.set_index("transaction_time", inplace=True)
 
-    streamlit_app(transactions, exclude_holiday=True)
+    # "server" fetches only what the selected view needs, "memory" keeps every
+    # transaction in the process with every view precomputed
+    query_mode = os.getenv("DASHBOARD_QUERY_MODE", "server")
+
+    with record_spans(timing_enabled) as spans:
+        with timed("dashboard.rerun"):
+            with timed("dashboard.load_data"):
+                if query_mode == "memory":
+                    transactions, version = get_transaction_cache().get_with_version()
+                    data = get_analytics_service(transactions, version).view(
+                        exclude_holiday=True
+                    )
+                else:
+                    data = get_period_queries(get_data_version(), exclude_holiday=True)
+
+            streamlit_app(data, exclude_holiday=True)
+
+    if spans is not None:
+        Figures.render_timing_flame_chart(spans)
@@ -1,21 +1,66 @@
+from typing import Callable, Hashable
+
 import pandas as pd
 import plotly.express as px
+import plotly.graph_objects as go
 import streamlit as st
 
+from personal_dashboard.backend.timing import Span, timed
+
+# Longer histories are windowed to the bars leading up to the selected period
+MAX_BARS = 104
+FIGURE_CACHE_ENTRIES = 256
+
 
 class Figures:
 
     @staticmethod
-    def category_spending_pie_chart(df: pd.DataFrame):
+    @st.cache_resource(max_entries=FIGURE_CACHE_ENTRIES, show_spinner=False)
+    def _cached_figure(key: tuple, _build: Callable[[], go.Figure]) -> go.Figure:
+        return _build()
+
+    @staticmethod
+    def figure(key: Hashable | None, build: Callable[[], go.Figure]) -> go.Figure:
+        """Build a figure once per key and share it between reruns and sessions
+
+        :param key: Identifies the figure's contents, e.g. the figure, data version
+            and period. None builds the figure without caching it.
+        """
+        if key is None:
+            return build()
+        return Figures._cached_figure(key, build)
+
+    @staticmethod
+    @timed("Figures.category_spending_pie_chart")
+    def category_spending_pie_chart(
+        df: pd.DataFrame,
+        cache_key: Hashable = None,
+        category_totals: pd.Series | None = None,
+    ):
         st.markdown(
             "<h4 style='text-align: left; color: white;'>Percentage of Expenses by Category</h4>",
             unsafe_allow_html=True,
         )
-
-        category_expenses = (
-            df.groupby("category")["amount_gbp"].sum().abs().reset_index()
+        st.plotly_chart(
+            Figures.figure(
+                None if cache_key is None else ("pie", cache_key),
+                lambda: Figures.category_spending_pie_figure(df, category_totals),
+            )
         )
 
+    @staticmethod
+    @timed("Figures.category_spending_pie_figure")
+    def category_spending_pie_figure(
+        df: pd.DataFrame, category_totals: pd.Series | None = None
+    ) -> go.Figure:
+        """
+        :param category_totals: Optional spending per category of df, e.g.
+            precomputed, instead of grouping df
+        """
+        if category_totals is None:
+            category_totals = df.groupby("category", observed=True)["amount_gbp"].sum()
+        category_expenses = category_totals.abs().reset_index()
+
         fig = px.pie(
             category_expenses,
             values="amount_gbp",
@@ -27,9 +72,10 @@ class Figures:
         fig.update_layout(
             margin=dict(l=20, r=20, t=20, b=20),
         )
-        st.plotly_chart(fig)
+        return fig
 
     @staticmethod
+    @timed("Figures.top_category_spending_table")
     def top_category_spending_table(df: pd.DataFrame):
         # Display top expense categories in a table
         st.markdown(
@@ -45,14 +91,44 @@ class Figures:
         st.table(expenses_df)
 
     @staticmethod
-    def category_spending_over_time_stacked_bar(df: pd.DataFrame, month_or_week: str):
+    @timed("Figures.category_spending_over_time_stacked_bar")
+    def category_spending_over_time_stacked_bar(
+        df: pd.DataFrame,
+        month_or_week: str,
+        end: pd.Timestamp | None = None,
+        cache_key: Hashable = None,
+    ):
         st.markdown(
             f"<h4 style='text-align: left; color: white;'>{month_or_week}ly Expenses over Time</h4>",
             unsafe_allow_html=True,
         )
-        df.reset_index(inplace=True)
+        st.plotly_chart(
+            Figures.figure(
+                None if cache_key is None else ("over_time", cache_key),
+                lambda: Figures.category_spending_over_time_figure(
+                    df, month_or_week, end
+                ),
+            )
+        )
+
+    @staticmethod
+    @timed("Figures.category_spending_over_time_figure")
+    def category_spending_over_time_figure(
+        df: pd.DataFrame,
+        month_or_week: str,
+        end: pd.Timestamp | None = None,
+        max_bars: int = MAX_BARS,
+    ) -> go.Figure:
+        """
+        :param df: Category spending per period, indexed by period start
+        :param end: Only periods starting up to this time are shown, all when None
+        :param max_bars: Only the max_bars periods up to end are drawn
+        """
+        if end is not None:
+            df = df.loc[:end]
+        df = df.tail(max_bars).reset_index()
         if month_or_week == "Month":
-            format = "%B"
+            format = "%b %Y"
         else:
             format = "%m-%d"
 
@@ -69,6 +145,35 @@ class Figures:
             },
             color_discrete_sequence=px.colors.qualitative.Set2,  # Optional: custom color palette
         )
-        # Step 4: Display in Streamlit
         fig.update_xaxes(type="category")
-        st.plotly_chart(fig)
+        return fig
+
+    @staticmethod
+    def render_timing_flame_chart(spans: list[Span]):
+        """Debug panel laying out the spans of one rerun, nested calls below"""
+        timings = pd.DataFrame(
+            {
+                "span": [span.name for span in spans],
+                "start_ms": [span.start * 1000 for span in spans],
+                "duration_ms": [span.duration * 1000 for span in spans],
+                "depth": [span.depth for span in spans],
+            }
+        )
+        with st.expander("Render timing"):
+            fig = px.bar(
+                timings,
+                x="duration_ms",
+                y="depth",
+                base="start_ms",
+                orientation="h",
+                text="span",
+                hover_data=["span", "start_ms", "duration_ms"],
+                labels={"duration_ms": "Time (ms)", "depth": "Depth"},
+            )
+            fig.update_yaxes(autorange="reversed", dtick=1)
+            fig.update_traces(textposition="inside", insidetextanchor="start")
+            st.plotly_chart(fig)
+            st.dataframe(
+                timings.sort_values("duration_ms", ascending=False),
+                hide_index=True,
+            )
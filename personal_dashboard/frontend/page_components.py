@@ -2,52 +2,45 @@ from datetime import datetime as dt
 
 import pandas as pd
 import streamlit as st
-from dateutil.relativedelta import relativedelta
 
 from personal_dashboard.backend.financial_analysis import (
     SpendingAnalysis,
     Stats,
     TransactionPeriod,
 )
+from personal_dashboard.backend.period_data import PeriodData
+from personal_dashboard.backend.rolling_analysis import RollingStats
+from personal_dashboard.backend.search_index import search_words
+from personal_dashboard.backend.timing import timed
 from personal_dashboard.frontend.figures import Figures
 
 
 class PageComponents:
 
-    def __init__(self, df: pd.DataFrame, exclude_holiday=False) -> None:
-        self.df = df
+    @timed("PageComponents.__init__")
+    def __init__(self, data: PeriodData, exclude_holiday=False) -> None:
+        """
+        :param data: Serves every view, an AnalyticsView or PeriodQueries shared
+            by the sessions. Its version keys the figures cached between reruns.
+        :param exclude_holiday: Whether data leaves holidays out, part of the
+            figure cache keys
+        """
+        self.data = data
         self.exclude_holiday = exclude_holiday
-        if self.exclude_holiday:
-            self.df = self.df[self.df["category"] != "Holiday"]
-
-        self.transaction_period = TransactionPeriod(self.df.copy())
-
-    def __get_stats(
-        self, period: pd.DataFrame, older_period: pd.DataFrame, month_or_week: str
-    ) -> Stats:
-        average_expense = SpendingAnalysis.get_average_expense(self.df, month_or_week)
-        total_expense = SpendingAnalysis.get_total_expense(period)
-        top_expense_amount, top_expense_description = (
-            SpendingAnalysis.get_top_expense_and_description(period)
-        )
-        diff_between_two_periods = SpendingAnalysis.get_diff_between_periods(
-            period, older_period
-        )
-        top_expense_categories = SpendingAnalysis.get_top_expense_categories(
-            period
-        ).items()
-
-        return Stats(
-            average_expense,
-            total_expense,
-            top_expense_amount,
-            top_expense_description,
-            diff_between_two_periods,
-            top_expense_categories,
-        )
+        self.data_version = data.version
 
-    def __metrics_row(self, stats: Stats, month_or_week: str):
-        col1, col2, col3 = st.columns(3)
+    @timed("PageComponents.get_rolling_stats")
+    def __get_rolling_stats(self, period: pd.Period) -> RollingStats:
+        rolling_spending = self.data.get_rolling_spending()
+
+        # Up to the end of the period, or the last day with data for the current one
+        day = min(period.end_time.normalize(), rolling_spending.last_day)
+        return rolling_spending.get_rolling_stats(day)
+
+    def __metrics_row(
+        self, stats: Stats, rolling_stats: RollingStats, month_or_week: str
+    ):
+        col1, col2, col3, col4, col5 = st.columns(5)
         col1.metric(
             label=f"Average {month_or_week}ly Expense",
             value=f"£{stats.average_expense:,.2f}",
@@ -67,6 +60,22 @@ class PageComponents:
             delta=stats.top_expense_description,
             delta_color="off",
         )
+
+        sign = "-" if rolling_stats.moving_average_change < 0 else "+"
+        col4.metric(
+            label=f"{rolling_stats.window_days}-Day Daily Average",
+            value=f"£{rolling_stats.moving_average:,.2f}",
+            delta=f"{sign} £{abs(rolling_stats.moving_average_change):,.2f} from {rolling_stats.window_days} days before",
+            delta_color="inverse",
+        )
+
+        sign = "-" if rolling_stats.year_to_date_change < 0 else "+"
+        col5.metric(
+            label="Year to Date Expense",
+            value=f"£{rolling_stats.year_to_date:,.2f}",
+            delta=f"{sign} £{abs(rolling_stats.year_to_date_change):,.2f} from last year",
+            delta_color="inverse",
+        )
         st.divider()
 
     def __figures_row(
@@ -75,52 +84,108 @@ class PageComponents:
         period_df: pd.DataFrame,
         category_spending_each_period_df: pd.DataFrame,
         month_or_week: str,
+        period: pd.Period,
+        frequency: str,
     ):
+        cache_key = (self.data_version, self.exclude_holiday, str(period))
+        category_totals = self.data.get_category_totals(period.start_time, frequency)
+
         col1, col2 = st.columns(2)
         with col1:
-            Figures.top_category_spending_table(stats.top_expense_categories)
+            Figures.top_category_spending_table(stats.top_expense_categories.items())
         with col2:
-            Figures.category_spending_pie_chart(period_df)
+            Figures.category_spending_pie_chart(period_df, cache_key, category_totals)
 
         st.divider()
 
         Figures.category_spending_over_time_stacked_bar(
-            category_spending_each_period_df, month_or_week
+            category_spending_each_period_df,
+            month_or_week,
+            end=period.end_time,
+            cache_key=cache_key,
         )
 
+    @timed("PageComponents.weekly_view")
     def weekly_view(self, chosen_datetime: dt):
-        chosen_iso = chosen_datetime.isocalendar()
-        week_df = self.transaction_period.get_week_df(chosen_iso.year, chosen_iso.week)
+        week_df = self.data.get_period_df(chosen_datetime, "W")
+        category_spending_each_week_df = self.data.get_category_spending_each_period(
+            "week"
+        )
 
-        week_before_iso = chosen_datetime - relativedelta(weeks=1)
-        week_before_df = self.transaction_period.get_week_df(
-            week_before_iso.year, week_before_iso.week
+        stats = self.data.get_stats(chosen_datetime, "W")
+        rolling_stats = self.__get_rolling_stats(pd.Period(chosen_datetime, "W"))
+        self.__metrics_row(stats, rolling_stats, "Week")
+        self.__figures_row(
+            stats,
+            week_df,
+            category_spending_each_week_df,
+            "Week",
+            pd.Period(chosen_datetime, "W"),
+            "W",
         )
 
-        category_spending_each_week_df = (
-            self.transaction_period.get_periodic_category_spending_df("W-MON")
+    @timed("PageComponents.monthly_view")
+    def monthly_view(self, chosen_datetime: dt):
+        month_df = self.data.get_period_df(chosen_datetime, "M")
+        category_spending_each_month_df = self.data.get_category_spending_each_period(
+            "month"
         )
 
-        stats = self.__get_stats(week_df, week_before_df, "W")
-        self.__metrics_row(stats, "Week")
-        self.__figures_row(stats, week_df, category_spending_each_week_df, "Week")
+        stats = self.data.get_stats(chosen_datetime, "M")
+        rolling_stats = self.__get_rolling_stats(pd.Period(chosen_datetime, "M"))
+        self.__metrics_row(stats, rolling_stats, "Month")
+        self.__figures_row(
+            stats,
+            month_df,
+            category_spending_each_month_df,
+            "Month",
+            pd.Period(chosen_datetime, "M"),
+            "M",
+        )
 
-    def monthly_view(self, chosen_datetime: dt):
-        year_month_str = chosen_datetime.strftime("%Y-%m")
-        month_df = self.transaction_period.get_month_df(year_month_str)
+    @timed("PageComponents.search_view")
+    def search_view(self, text: str):
+        """Spending over time of the transactions whose description matches text"""
+        words = search_words(text)
+        if not words:
+            return
 
-        try:
-            month_before_str = (chosen_datetime - relativedelta(months=1)).strftime(
-                "%Y-%m"
-            )
-            month_before_df = self.transaction_period.get_month_df(month_before_str)
-        except KeyError:
-            month_before_df = month_df
+        matches = self.data.search(text)
+        if matches.empty:
+            st.info(f"No transactions match '{text}'")
+            return
 
-        category_spending_each_month_df = (
-            self.transaction_period.get_periodic_category_spending_df("MS")
+        col1, col2, col3 = st.columns(3)
+        col1.metric(label="Matching Transactions", value=f"{len(matches):,}")
+        col2.metric(
+            label="Total Expense",
+            value=f"£{SpendingAnalysis.get_total_expense(matches):,.2f}",
+        )
+        col3.metric(
+            label="Average Expense",
+            value=f"£{matches['amount_gbp'].mean():,.2f}",
         )
+        st.divider()
+
+        cache_key = (self.data_version, self.exclude_holiday, "search", *words)
+
+        col1, col2 = st.columns(2)
+        with col1:
+            Figures.top_category_spending_table(
+                SpendingAnalysis.get_top_expense_categories(matches).items()
+            )
+        with col2:
+            Figures.category_spending_pie_chart(matches, cache_key)
+
+        st.divider()
 
-        stats = self.__get_stats(month_df, month_before_df, "ME")
-        self.__metrics_row(stats, "Month")
-        self.__figures_row(stats, month_df, category_spending_each_month_df, "Month")
+        Figures.category_spending_over_time_stacked_bar(
+            TransactionPeriod(matches).get_periodic_category_spending_df("MS"),
+            "Month",
+            cache_key=cache_key,
+        )
+        st.dataframe(
+            matches[["description", "amount_gbp", "category"]].sort_index(
+                ascending=False
+            )
+        )
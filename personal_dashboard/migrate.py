@@ -0,0 +1,35 @@
+"""Create and migrate the tables, indexes and rollups used by the dashboard
+
+Usage: python -m personal_dashboard.migrate
+
+Run once per deployment, before the webhook, reporting function or dashboard
+serve traffic. The migrations take ACCESS EXCLUSIVE locks, e.g. adding the
+content hash rewrites the transactions table, so none of them runs when a
+connection is opened.
+"""
+
+import argparse
+import os
+
+import psycopg
+from dotenv import load_dotenv
+from loguru import logger
+
+from personal_dashboard.backend.database import SqlConnections
+
+load_dotenv()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--dsn", default=os.getenv("DATABASE_URL_PSYCOPG"))
+    args = parser.parse_args()
+
+    SqlConnections.download_ca_cert()
+    with psycopg.connect(args.dsn) as conn:
+        SqlConnections.ensure_schema(conn)
+    logger.info("Database schema is up to date")
+
+
+if __name__ == "__main__":
+    main()
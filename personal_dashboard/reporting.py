@@ -0,0 +1,180 @@
+"""HTTP function streaming transactions and period summaries out of the database
+
+GET /?report=transactions&format=csv&start=2024-01-01&end=2024-02-01
+GET /?report=summary&period=month&format=json&exclude_category=Holiday
+
+Query parameters:
+
+- report: "transactions" (default) or "summary" of each day, week or month
+- format: "csv" (default) or "json", a JSON array of objects
+- start, end: ISO dates or times, start included and end excluded
+- category: Only transactions of this category, repeatable
+- exclude_category: Leave out this category, repeatable
+- search: Only transactions whose description contains every word
+- period: "day", "week" or "month" (default), for summaries
+
+Rows are read through a server-side cursor and written out as chunks of about
+CHUNK_SIZE bytes without a Content-Length, so the response uses chunked
+transfer encoding and memory stays constant whatever the size of the export.
+
+Requests must carry "Authorization: Bearer <REPORTING_TOKEN>". Reporting is
+disabled while REPORTING_TOKEN is unset.
+"""
+
+import csv
+import hmac
+import io
+import itertools
+import json
+import os
+from datetime import datetime
+from typing import Iterable, Iterator
+
+import functions_framework
+from dotenv import load_dotenv
+from flask import Response
+from loguru import logger
+
+from .backend.database import ROLLUP_PERIODS, YONDER_COLUMNS, SqlConnections
+
+load_dotenv()
+
+CHUNK_SIZE = 64 * 1024
+SUMMARY_COLUMNS = ("period_start", "total", "transaction_count", "max_amount")
+MIME_TYPES = {"csv": "text/csv", "json": "application/json"}
+
+
+class BadReportRequest(Exception):
+    """A report request with invalid parameters, answered with a 400"""
+
+
+def get_time(args, name: str) -> datetime | None:
+    value = args.get(name)
+    if value is None:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise BadReportRequest(f"{name} must be an ISO date or time, got {value!r}")
+
+
+def get_rows(args, conn) -> tuple[tuple[str, ...], Iterator[tuple]]:
+    """Columns and rows of the report described by the query parameters
+
+    :raises BadReportRequest: When a parameter is invalid
+    """
+    report = args.get("report", "transactions")
+    start, end = get_time(args, "start"), get_time(args, "end")
+    exclude_categories = tuple(args.getlist("exclude_category"))
+
+    if report == "transactions":
+        return YONDER_COLUMNS, SqlConnections.stream_transactions(
+            conn,
+            start=start,
+            end=end,
+            categories=tuple(args.getlist("category")),
+            exclude_categories=exclude_categories,
+            description_words=tuple(args.get("search", "").lower().split()),
+        )
+    if report == "summary":
+        period = args.get("period", "month")
+        if period not in ROLLUP_PERIODS:
+            raise BadReportRequest(f"period must be one of {', '.join(ROLLUP_PERIODS)}")
+        return SUMMARY_COLUMNS, SqlConnections.stream_period_summaries(
+            conn,
+            period,
+            start=start,
+            end=end,
+            exclude_categories=exclude_categories,
+        )
+    raise BadReportRequest("report must be transactions or summary")
+
+
+def csv_chunks(columns: tuple[str, ...], rows: Iterable[tuple]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode()
+
+
+def json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def json_chunks(columns: tuple[str, ...], rows: Iterable[tuple]) -> Iterator[bytes]:
+    """The rows as one JSON array of objects keyed by column"""
+    buffer = io.StringIO()
+    buffer.write("[")
+    separator = "\n"
+    for row in rows:
+        buffer.write(separator)
+        buffer.write(json.dumps(dict(zip(columns, row)), default=json_default))
+        separator = ",\n"
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    buffer.write("\n]\n")
+    yield buffer.getvalue().encode()
+
+
+def stream_report(args, file_format: str) -> Iterator[bytes]:
+    """Encoded chunks of the report, holding a pooled connection until done"""
+    with SqlConnections.connection() as conn:
+        columns, rows = get_rows(args, conn)
+        if file_format == "csv":
+            yield from csv_chunks(columns, rows)
+        else:
+            yield from json_chunks(columns, rows)
+
+
+def is_authorized(request) -> bool:
+    token = os.getenv("REPORTING_TOKEN")
+    if not token:
+        return False
+    return hmac.compare_digest(
+        request.headers.get("Authorization", ""), f"Bearer {token}"
+    )
+
+
+@functions_framework.http
+def reporting(request):
+    """Entry point for the reporting function"""
+    if request.method != "GET":
+        return "Only GET requests are allowed", 405
+    if not is_authorized(request):
+        logger.error(f"Unauthorized report request from {request.remote_addr}")
+        return "Unauthorized", 403
+
+    file_format = request.args.get("format", "csv")
+    if file_format not in MIME_TYPES:
+        return "format must be csv or json", 400
+
+    chunks = stream_report(request.args, file_format)
+    try:
+        # Produce the first chunk before answering, so bad parameters and
+        # database errors get a status code rather than a truncated body
+        first_chunk = next(chunks)
+    except BadReportRequest as e:
+        return str(e), 400
+    except Exception as e:
+        logger.error(f"Failed to start report: {e}")
+        return "Failed to produce report", 500
+
+    report = request.args.get("report", "transactions")
+    logger.info(f"Streaming {report} report as {file_format}")
+    return Response(
+        itertools.chain([first_chunk], chunks),
+        mimetype=MIME_TYPES[file_format],
+        headers={
+            "Content-Disposition": f'attachment; filename="{report}.{file_format}"'
+        },
+    )
@@ -1,5 +1,10 @@
+import atexit
 import csv
+import itertools
 import os
+import threading
+import time
+from typing import Iterator
 
 import functions_framework
 import httpx
@@ -7,25 +12,63 @@ from dotenv import load_dotenv
 from loguru import logger
 
 from .backend.database import SqlConnections
+from .backend.importers import ARCHIVE_MIME_TYPES, parse_rows, parse_statements
+from .backend.ingest_metrics import (
+    INGEST_COUNTERS,
+    METRICS_ENDPOINT,
+    PROMETHEUS_CONTENT_TYPE,
+    IngestMetrics,
+)
 
 load_dotenv()
 
 # TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
-TELEGRAM_API_URL = f"https://api.telegram.org"
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org")
+HTTP_TIMEOUT = httpx.Timeout(10, connect=3, read=30)
+HTTP_LIMITS = httpx.Limits(max_connections=8, keepalive_expiry=120)
+MAX_RETRIES = int(os.getenv("TELEGRAM_MAX_RETRIES", 3))
+RETRY_BACKOFF = 0.5
+# Caps Telegram's retry_after, so a retry never outlasts the function's timeout
+MAX_RETRY_DELAY = float(os.getenv("TELEGRAM_MAX_RETRY_DELAY", 5))
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+# Raised before the request reached Telegram, so even a sendMessage can be resent
+CONNECT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
 
+_client: httpx.Client | None = None
+_client_lock = threading.Lock()
 
-@functions_framework.http
-def telegram_webhook(request):
-    """Entry point for Telegram webhook."""
-    # Parse the incoming request data
-    if request.method != "POST":
-        return "Only POST requests are allowed", 405
+CSV_MIME_TYPES = ("text/csv", "text/comma-separated-values")
 
-    update = request.get_json()
 
+class RejectedUpdate(Exception):
+    """An update that carries nothing to ingest
+
+    :param response: Body and status code to answer the webhook call with
+    :param chat_id: Chat to send reply to, when the update had one
+    :param reply: Message explaining the rejection to the user
+    """
+
+    def __init__(
+        self,
+        response: tuple[str, int],
+        chat_id: int | None = None,
+        reply: str | None = None,
+    ):
+        super().__init__(response[0])
+        self.response = response
+        self.chat_id = chat_id
+        self.reply = reply
+
+
+def get_document(update: dict | None) -> tuple[int, dict]:
+    """Check an update comes from the allowed user and carries a CSV document
+
+    :return (chat_id, document): The chat to answer and the Telegram document
+    :raises RejectedUpdate: When the update must not be ingested
+    """
     if not update or "message" not in update:
         logger.error(f"No message in update")
-        return "No message in update", 400
+        raise RejectedUpdate(("No message in update", 400))
 
     user_id = update["message"]["from"]["id"]
     first_name = update["message"]["from"]["first_name"]
@@ -34,102 +77,278 @@ def telegram_webhook(request):
 
     if str(user_id) != os.getenv("ALLOWED_USER_IDS"):
         logger.error(f"Unapproved user: {first_name} {last_name}. Update: {update}")
-        return f"Unapproved user: {first_name} {last_name}", 403
+        raise RejectedUpdate((f"Unapproved user: {first_name} {last_name}", 403))
 
     # Check if the message contains a document (file)
     if "document" not in update["message"]:
-        send_msg(chat_id, "Please provide a csv file")
-        return "No document provided", 200
+        raise RejectedUpdate(
+            ("No document provided", 200),
+            chat_id,
+            "Please provide a csv file or a zip of csv files",
+        )
 
     document = update["message"]["document"]
 
-    # Check if the file is a CSV
-    if (
-        document["mime_type"] != "text/csv"
-        and document["mime_type"] != "text/comma-separated-values"
-    ):
-        send_msg(
+    # Check if the file is a CSV or an archive of them
+    if document["mime_type"] not in CSV_MIME_TYPES + ARCHIVE_MIME_TYPES:
+        raise RejectedUpdate(
+            ("Document must be of .csv or .zip type", 200),
             chat_id,
-            f"Please provide a .csv file. Current file type is {document['mime_type']}",
+            f"Please provide a .csv or .zip file. Current file type is {document['mime_type']}",
         )
-        return "Document must be of .csv type", 200
+
+    return chat_id, document
+
+
+@functions_framework.http
+def telegram_webhook(request):
+    """Entry point for Telegram webhook."""
+    if request.method == "GET" and METRICS_ENDPOINT:
+        return metrics_endpoint(request)
+
+    # Parse the incoming request data
+    if request.method != "POST":
+        return "Only POST requests are allowed", 405
+
+    update = request.get_json()
+    metrics = IngestMetrics(update_id=(update or {}).get("update_id"))
+    try:
+        return ingest_update(update, metrics)
+    finally:
+        metrics.emit()
+
+
+def metrics_endpoint(request):
+    """Ingest counters of this instance for Prometheus to scrape"""
+    if not request.path.rstrip("/").endswith("/metrics"):
+        return "Not found", 404
+    return INGEST_COUNTERS.render(), 200, {"Content-Type": PROMETHEUS_CONTENT_TYPE}
+
+
+def ingest_update(update: dict | None, metrics: IngestMetrics):
+    """Load the document of an update, recording each stage in metrics"""
+    try:
+        chat_id, document = get_document(update)
+    except RejectedUpdate as rejected:
+        metrics.status = "rejected"
+        if rejected.reply:
+            send_msg(rejected.chat_id, rejected.reply)
+        return rejected.response
 
     file_id = document["file_id"]
+    metrics.file_name = file_name = document["file_name"]
 
     # Download the file from Telegram
     try:
-        file_path = get_file_path(file_id)
+        with metrics.stage("get_file_path"):
+            file_path = get_file_path(file_id)
 
-        csv_url = f"{TELEGRAM_API_URL}/file/bot{os.getenv("TELEGRAM_BOT_TOKEN")}/{file_path}"
+        csv_url = file_url(file_path)
 
-        file_name = document["file_name"]
-        download_file(csv_url, file_name)
-        update_db(f"/tmp/{file_name}")
-        send_msg(chat_id, "Transactions Processed")
+        if document["mime_type"] in ARCHIVE_MIME_TYPES:
+            inserted, skipped = import_archive(file_name, csv_url, metrics)
+        else:
+            inserted, skipped = update_db(csv_url, metrics)
+        metrics.inserted, metrics.skipped = inserted, skipped
+        with metrics.stage("reply"):
+            send_msg(
+                chat_id,
+                f"Transactions Processed: {inserted} new, {skipped} already stored",
+            )
         return f"{file_name} downloaded", 200
 
     except Exception as e:
+        metrics.status = "failed"
         send_msg(chat_id, e)
         return "Failed to process file", 500
 
 
+def get_client() -> httpx.Client:
+    """Process-wide HTTP/2 client, so warm instances reuse their connection"""
+    global _client
+
+    with _client_lock:
+        if _client is None:
+            _client = httpx.Client(http2=True, timeout=HTTP_TIMEOUT, limits=HTTP_LIMITS)
+            atexit.register(_client.close)
+        return _client
+
+
+def retry_delay(response: httpx.Response, attempt: int) -> float | None:
+    """Seconds to wait before retrying a request, None if it should not be retried
+
+    Telegram's retry_after is honoured for 429s, otherwise the Retry-After header,
+    falling back to exponential backoff, all capped at MAX_RETRY_DELAY. The
+    response body must have been read.
+    """
+    if response.status_code not in RETRY_STATUS_CODES or attempt >= MAX_RETRIES:
+        return None
+    try:
+        delay = float(response.json()["parameters"]["retry_after"])
+    except (ValueError, KeyError, TypeError):
+        try:
+            delay = float(response.headers["Retry-After"])
+        except (ValueError, KeyError):
+            delay = RETRY_BACKOFF * 2**attempt
+    return min(max(delay, 0), MAX_RETRY_DELAY)
+
+
+def should_retry(exc: httpx.TransportError, attempt: int, idempotent: bool) -> bool:
+    """Whether a request that failed in transport may be sent again
+
+    A request that is not idempotent, like sendMessage, may already have been
+    handled when e.g. reading the response timed out, so it is only resent
+    when the connection could not be made.
+    """
+    return attempt < MAX_RETRIES and (idempotent or isinstance(exc, CONNECT_ERRORS))
+
+
+def request(
+    method: str, url: str, idempotent: bool = True, **kwargs
+) -> httpx.Response:
+    """Send a request with the shared client, retrying transient failures
+
+    :param idempotent: False for requests that must not be repeated once sent
+    """
+    for attempt in itertools.count():
+        try:
+            response = get_client().request(method, url, **kwargs)
+        except httpx.TransportError as exc:
+            if not should_retry(exc, attempt, idempotent):
+                raise exc
+            delay = RETRY_BACKOFF * 2**attempt
+            logger.warning(f"Request to Telegram failed: {exc!r}. Retrying in {delay}s")
+        else:
+            delay = retry_delay(response, attempt)
+            if delay is None:
+                return response
+            logger.warning(
+                f"Telegram answered {response.status_code}. Retrying in {delay}s"
+            )
+        time.sleep(delay)
+
+
+def bot_url(method: str) -> str:
+    return f"{TELEGRAM_API_URL}/bot{os.getenv('TELEGRAM_BOT_TOKEN')}/{method}"
+
+
+def file_url(file_path: str) -> str:
+    return f"{TELEGRAM_API_URL}/file/bot{os.getenv('TELEGRAM_BOT_TOKEN')}/{file_path}"
+
+
 def get_file_path(file_id):
     """Get the file path for the given file_id."""
-    url = f"{TELEGRAM_API_URL}/bot{os.getenv("TELEGRAM_BOT_TOKEN")}/getFile?file_id={file_id}"
-    logger.debug(f"Getting file id from url: {url}")
+    logger.debug(f"Getting file path for file id: {file_id}")
     try:
-        response = httpx.get(url)
+        response = request("GET", bot_url("getFile"), params={"file_id": file_id})
         response.raise_for_status()
         file_path = response.json()["result"]["file_path"]
         logger.debug(f"Retrieved file_path: {file_path}")
         return file_path
-    except httpx.HTTPError as exc:
+    except httpx.HTTPStatusError as exc:
         logger.error(
-            f"Failed to get file path from {exc.request.url!r}. Error: {response.text}"
+            f"Failed to get file path from {exc.request.url!r}. Error: {exc.response.text}"
         )
         raise exc
 
 
-def download_file(url, file_name):
-    """Download the file from the given URL."""
+def stream_csv_rows(url, metrics: IngestMetrics | None = None) -> Iterator[list[str]]:
+    """Stream the file at the given URL as parsed CSV rows.
+
+    The response body is decoded incrementally, so only the current chunk is
+    held in memory regardless of the size of the export. Transient errors are
+    retried before the first row is produced.
+
+    :param metrics: Optional metrics recording the download stage and its bytes
+    """
+    metrics = metrics or IngestMetrics()
+    logger.debug(f"Attemping to stream file from url: {url}")
     try:
-        logger.debug(f"Attemping to download file from url: {url}")
-        response = httpx.get(url)
-        response.raise_for_status()
-        with open(f"/tmp/{file_name}", "wb") as f:
-            f.write(response.content)
-        logger.debug(f"File {file_name} downloaded successfully")
-        return file_name
+        for attempt in itertools.count():
+            with get_client().stream("GET", url) as response:
+                if response.status_code in RETRY_STATUS_CODES:
+                    response.read()
+                delay = retry_delay(response, attempt)
+                if delay is None:
+                    response.raise_for_status()
+                    yield from csv.reader(
+                        metrics.metered(iter_lines(response.iter_text()), "download")
+                    )
+                    metrics.bytes_downloaded += response.num_bytes_downloaded
+                    break
+            logger.warning(
+                f"Telegram answered {response.status_code}. Retrying in {delay}s"
+            )
+            time.sleep(delay)
+        logger.debug(f"File streamed successfully")
     except httpx.HTTPError as exc:
-        logger.error(
-            f"Failed to download file from {exc.request.url!r}. Error: {response.text}"
-        )
+        logger.error(f"Failed to download file from {exc.request.url!r}. Error: {exc}")
         raise exc
 
 
+def iter_lines(chunks: Iterator[str]) -> Iterator[str]:
+    """Split decoded text chunks into lines as they arrive
+
+    Lines are only split on "\\n" and keep it, so csv.reader still sees the line
+    breaks inside quoted fields. httpx's iter_lines and str.splitlines drop them
+    or split on other separators, changing the row's content hash.
+    """
+    pending = ""
+    for chunk in chunks:
+        *lines, pending = (pending + chunk).split("\n")
+        for line in lines:
+            yield line + "\n"
+    if pending:
+        yield pending
+
+
 def send_msg(chat_id, text):
     try:
-        response = httpx.get(
-            f"{TELEGRAM_API_URL}/bot{os.getenv("TELEGRAM_BOT_TOKEN")}/sendMessage?chat_id={chat_id}&text={text}"
+        response = request(
+            "GET",
+            bot_url("sendMessage"),
+            idempotent=False,
+            params={"chat_id": chat_id, "text": str(text)},
         )
         response.raise_for_status()
-    except httpx.HTTPError as exc:
+    except httpx.HTTPStatusError as exc:
         logger.error(
-            f"Failed to send message using {exc.request.url!r}. Error: {response.text}"
+            f"Failed to send message using {exc.request.url!r}. Error: {exc.response.text}"
         )
         raise exc
 
 
-def update_db(file_path):
+def update_db(csv_url, metrics: IngestMetrics | None = None):
+    """Stream a CSV statement into the database
+
+    Download, parsing and upsert are interleaved, metrics splits their time.
+    """
+    metrics = metrics or IngestMetrics()
+    rows = metrics.metered(
+        parse_rows(stream_csv_rows(csv_url, metrics)), "parse", count_rows=True
+    )
     try:
-        with open(file_path) as csv_file_object:
-            csv_list = list(csv.reader(csv_file_object))
-        conn = SqlConnections.sql_connect()
-        SqlConnections.upsert_transaction(conn, csv_list)
-        conn.close()
-    except FileNotFoundError as e:
-        logger.error(f"Could not find csv file. {e}")
+        with metrics.stage("upsert"), SqlConnections.connection() as conn:
+            return SqlConnections.bulk_upsert_transactions(conn, rows)
+    except httpx.HTTPError as e:
+        logger.error(f"Could not download csv file. {e}")
         raise e
     except Exception as e:
         logger.error(f"Failed to interact with Database")
         raise e
+
+
+def import_archive(file_name, url, metrics: IngestMetrics | None = None):
+    """Download a zip of statements and load them all in one bulk write"""
+    metrics = metrics or IngestMetrics()
+    with metrics.stage("download"):
+        response = request("GET", url)
+        response.raise_for_status()
+    metrics.bytes_downloaded += len(response.content)
+
+    with metrics.stage("parse"):
+        batch = parse_statements([(file_name, response.content)])
+    metrics.rows += len(batch)
+
+    with metrics.stage("upsert"), SqlConnections.connection() as conn:
+        return SqlConnections.bulk_upsert_transactions(conn, batch.rows())
@@ -0,0 +1,344 @@
+"""Telegram webhook that acknowledges updates immediately and ingests in the background
+
+Telegram redelivers an update whenever the webhook does not answer in time, so
+the request handler only validates the update and queues it. A background event
+loop downloads, parses and loads the file, then reports back to the chat.
+
+Updates are deduplicated twice: by update_id in memory, catching redeliveries
+that reach the same instance, and by the document's file_unique_id in the
+database, which is claimed in the same transaction as the rows it loaded.
+
+On Cloud Functions the instance must keep CPU allocated after the response
+(Cloud Run "CPU always allocated"), otherwise queued jobs only progress while
+another request is being served.
+"""
+
+import asyncio
+import csv
+import itertools
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Iterator
+
+import functions_framework
+import httpx
+from dotenv import load_dotenv
+from loguru import logger
+
+from .backend.database import SqlConnections
+from .backend.importers import ARCHIVE_MIME_TYPES, parse_rows, parse_statements
+from .backend.ingest_metrics import METRICS_ENDPOINT, IngestMetrics
+from .telegram_webhook import (
+    HTTP_LIMITS,
+    HTTP_TIMEOUT,
+    RETRY_BACKOFF,
+    RETRY_STATUS_CODES,
+    RejectedUpdate,
+    bot_url,
+    file_url,
+    get_document,
+    iter_lines,
+    metrics_endpoint,
+    retry_delay,
+    should_retry,
+)
+
+load_dotenv()
+
+QUEUE_SIZE = int(os.getenv("WEBHOOK_QUEUE_SIZE", 8))
+WORKERS = int(os.getenv("WEBHOOK_WORKERS", 2))
+# Number of recent update_ids remembered for deduplication
+SEEN_UPDATES = 1024
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+@dataclass
+class IngestJob:
+    update_id: int | None
+    chat_id: int
+    file_id: str
+    file_unique_id: str
+    file_name: str
+    mime_type: str
+    # Started when the update is queued, emitted once it is processed
+    metrics: IngestMetrics = field(default_factory=IngestMetrics)
+
+
+class IngestWorker:
+    """Event loop on a daemon thread, draining a bounded queue of ingest jobs
+
+    :param workers: Number of jobs processed concurrently
+    :param queue_size: Jobs waiting beyond this are refused
+    """
+
+    def __init__(self, workers: int = WORKERS, queue_size: int = QUEUE_SIZE):
+        self.workers = workers
+        self.queue_size = queue_size
+        self._loop = asyncio.new_event_loop()
+        self._ready = threading.Event()
+        self._seen = OrderedDict()
+        self._seen_lock = threading.Lock()
+        self._thread = threading.Thread(
+            target=self._loop.run_until_complete,
+            args=(self._serve(),),
+            name="telegram-ingest",
+            daemon=True,
+        )
+
+    def start(self) -> "IngestWorker":
+        self._thread.start()
+        self._ready.wait()
+        return self
+
+    async def _serve(self):
+        self._queue = asyncio.Queue(self.queue_size)
+        async with httpx.AsyncClient(
+            http2=True, timeout=HTTP_TIMEOUT, limits=HTTP_LIMITS
+        ) as self._client:
+            self._ready.set()
+            await asyncio.gather(*(self._work() for _ in range(self.workers)))
+
+    def seen(self, update_id: int) -> bool:
+        """Whether update_id was already accepted, remembering it if not"""
+        with self._seen_lock:
+            if update_id in self._seen:
+                return True
+            self._seen[update_id] = None
+            if len(self._seen) > SEEN_UPDATES:
+                self._seen.popitem(last=False)
+            return False
+
+    def forget(self, update_id: int):
+        with self._seen_lock:
+            self._seen.pop(update_id, None)
+
+    def submit(self, job: IngestJob) -> bool:
+        """Queue a job from the request thread
+
+        :return: False when the queue is full
+        """
+        return asyncio.run_coroutine_threadsafe(self._enqueue(job), self._loop).result()
+
+    async def _enqueue(self, job: IngestJob) -> bool:
+        try:
+            self._queue.put_nowait(job)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    def notify(self, chat_id: int, text: str):
+        """Send a message without waiting for Telegram to answer"""
+        asyncio.run_coroutine_threadsafe(self._send_msg(chat_id, text), self._loop)
+
+    async def _work(self):
+        while True:
+            job = await self._queue.get()
+            job.metrics.stage_seconds["queued"] += (
+                time.perf_counter() - job.metrics.start
+            )
+            try:
+                await self._process(job)
+            except Exception as e:
+                job.metrics.status = "failed"
+                logger.exception(f"Failed to process {job.file_name}")
+                await self._send_msg(job.chat_id, f"Failed to process file: {e}")
+            finally:
+                job.metrics.emit()
+                self._queue.task_done()
+
+    async def _process(self, job: IngestJob):
+        metrics = job.metrics
+        if await asyncio.to_thread(is_file_ingested, job.file_unique_id):
+            logger.info(f"Skipping {job.file_name}, it was already ingested")
+            await self._reply_duplicate(job)
+            return
+
+        with metrics.stage("get_file_path"):
+            csv_url = file_url(await self._get_file_path(job.file_id))
+
+        if job.mime_type in ARCHIVE_MIME_TYPES:
+            with metrics.stage("download"):
+                response = await self._request("GET", csv_url)
+                response.raise_for_status()
+            metrics.bytes_downloaded += len(response.content)
+            result = await asyncio.to_thread(ingest_archive, job, response.content)
+        else:
+            result = await self._stream_document(job, csv_url)
+
+        if result is None:
+            logger.info(f"Skipping {job.file_name}, it was ingested concurrently")
+            await self._reply_duplicate(job)
+            return
+
+        metrics.inserted, metrics.skipped = inserted, skipped = result
+        with metrics.stage("reply"):
+            await self._send_msg(
+                job.chat_id,
+                f"Transactions Processed: {inserted} new, {skipped} already stored",
+            )
+
+    async def _reply_duplicate(self, job: IngestJob):
+        job.metrics.status = "duplicate"
+        with job.metrics.stage("reply"):
+            await self._send_msg(job.chat_id, f"{job.file_name} was already processed")
+
+    async def _stream_document(
+        self, job: IngestJob, csv_url: str
+    ) -> tuple[int, int] | None:
+        logger.debug(f"Attemping to stream file from url: {csv_url}")
+        for attempt in itertools.count():
+            async with self._client.stream("GET", csv_url) as response:
+                if response.status_code in RETRY_STATUS_CODES:
+                    await response.aread()
+                delay = retry_delay(response, attempt)
+                if delay is None:
+                    response.raise_for_status()
+                    lines = job.metrics.metered(
+                        iter_lines(
+                            iterate_in_thread(response.aiter_text(), self._loop)
+                        ),
+                        "download",
+                    )
+                    rows = job.metrics.metered(
+                        parse_rows(csv.reader(lines)), "parse", count_rows=True
+                    )
+                    result = await asyncio.to_thread(ingest_document, job, rows)
+                    job.metrics.bytes_downloaded += response.num_bytes_downloaded
+                    return result
+            await asyncio.sleep(delay)
+
+    async def _request(
+        self, method: str, url: str, idempotent: bool = True, **kwargs
+    ) -> httpx.Response:
+        """Send a request, retrying transient failures like telegram_webhook.request"""
+        for attempt in itertools.count():
+            try:
+                response = await self._client.request(method, url, **kwargs)
+            except httpx.TransportError as exc:
+                if not should_retry(exc, attempt, idempotent):
+                    raise exc
+                delay = RETRY_BACKOFF * 2**attempt
+            else:
+                delay = retry_delay(response, attempt)
+                if delay is None:
+                    return response
+            logger.warning(f"Telegram request failed. Retrying in {delay}s")
+            await asyncio.sleep(delay)
+
+    async def _get_file_path(self, file_id: str) -> str:
+        response = await self._request(
+            "GET", bot_url("getFile"), params={"file_id": file_id}
+        )
+        response.raise_for_status()
+        return response.json()["result"]["file_path"]
+
+    async def _send_msg(self, chat_id: int, text: str):
+        try:
+            response = await self._request(
+                "GET",
+                bot_url("sendMessage"),
+                idempotent=False,
+                params={"chat_id": chat_id, "text": text},
+            )
+            response.raise_for_status()
+        except httpx.HTTPError as exc:
+            logger.error(f"Failed to send message to chat {chat_id}. Error: {exc}")
+
+
+def get_worker() -> IngestWorker:
+    """Process-wide ingest worker, started on first use"""
+    global _worker
+
+    with _worker_lock:
+        if _worker is None:
+            _worker = IngestWorker().start()
+        return _worker
+
+
+def iterate_in_thread(
+    chunks: AsyncIterator[str], loop: asyncio.AbstractEventLoop
+) -> Iterator[str]:
+    """Consume an async iterator running on loop from a worker thread"""
+    while True:
+        try:
+            yield asyncio.run_coroutine_threadsafe(anext(chunks), loop).result()
+        except StopAsyncIteration:
+            return
+
+
+def is_file_ingested(file_unique_id: str) -> bool:
+    with SqlConnections.connection() as conn:
+        return SqlConnections.is_file_ingested(conn, file_unique_id)
+
+
+def ingest_document(job: IngestJob, rows: Iterator[tuple]) -> tuple[int, int] | None:
+    """Claim the document and load its rows in one transaction
+
+    :return (inserted, skipped): None when another delivery claimed it first
+    """
+    with job.metrics.stage("upsert"), SqlConnections.connection() as conn:
+        if not SqlConnections.claim_file(conn, job.file_unique_id, job.update_id):
+            return None
+        return SqlConnections.bulk_upsert_transactions(conn, rows)
+
+
+def ingest_archive(job: IngestJob, data: bytes) -> tuple[int, int] | None:
+    """Parse every statement of a zip archive in parallel, then ingest_document"""
+    with job.metrics.stage("parse"):
+        batch = parse_statements([(job.file_name, data)])
+    job.metrics.rows += len(batch)
+    return ingest_document(job, batch.rows())
+
+
+@functions_framework.http
+def telegram_webhook_async(request):
+    """Entry point for Telegram webhook, answering before the file is processed"""
+    if request.method == "GET" and METRICS_ENDPOINT:
+        return metrics_endpoint(request)
+
+    if request.method != "POST":
+        return "Only POST requests are allowed", 405
+
+    update = request.get_json()
+    worker = get_worker()
+
+    try:
+        chat_id, document = get_document(update)
+    except RejectedUpdate as rejected:
+        IngestMetrics(status="rejected").emit()
+        if rejected.reply:
+            worker.notify(rejected.chat_id, rejected.reply)
+        return rejected.response
+
+    update_id = update.get("update_id")
+    if update_id is not None and worker.seen(update_id):
+        IngestMetrics(
+            update_id=update_id, file_name=document["file_name"], status="duplicate"
+        ).emit()
+        logger.info(f"Ignoring redelivered update {update_id}")
+        return "Update already received", 200
+
+    job = IngestJob(
+        update_id=update_id,
+        chat_id=chat_id,
+        file_id=document["file_id"],
+        file_unique_id=document["file_unique_id"],
+        file_name=document["file_name"],
+        mime_type=document["mime_type"],
+        metrics=IngestMetrics(update_id=update_id, file_name=document["file_name"]),
+    )
+    if not worker.submit(job):
+        # Let Telegram redeliver once the queue has drained
+        if update_id is not None:
+            worker.forget(update_id)
+        job.metrics.status = "busy"
+        job.metrics.emit()
+        logger.warning(f"Ingest queue full, refusing update {update_id}")
+        return "Busy, retry later", 503
+
+    return f"{job.file_name} queued", 200
@@ -0,0 +1,101 @@
+import os
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+
+@pytest.fixture
+def database_url():
+    """DSN of a Postgres whose search_path is a fresh, empty schema
+
+    Tests using it are skipped unless TEST_DATABASE_URL points at a Postgres
+    the tests may create schemas in.
+    """
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL is not set")
+
+    import psycopg
+
+    from benchmarks.database import drop_schema, prepare_schema
+
+    schema = f"test_{uuid.uuid4().hex[:12]}"
+    with psycopg.connect(TEST_DATABASE_URL) as conn:
+        prepare_schema(conn, schema)
+        conn.commit()
+        yield f"{TEST_DATABASE_URL}?options=-csearch_path%3D{schema}"
+        conn.execute(f"SET search_path TO {schema}")
+        drop_schema(conn, schema)
+
+
+class StubTelegram:
+    """Local HTTP server answering each request with the next queued response
+
+    Requests are recorded as (method, path). Once the queue is empty every
+    request is answered with Telegram's empty success.
+    """
+
+    def __init__(self):
+        self.requests = []
+        self.responses = []
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stub.requests.append(("GET", self.path))
+                status, headers, body, delay = (
+                    stub.responses.pop(0)
+                    if stub.responses
+                    else (200, {}, b'{"ok": true}', 0)
+                )
+                time.sleep(delay)
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+
+    def respond(
+        self,
+        status: int = 200,
+        body: bytes | str = b"",
+        delay: float = 0,
+        headers: dict[str, str] | None = None,
+    ):
+        """Queue a response, sent after delay seconds"""
+        if isinstance(body, str):
+            body = body.encode()
+        self.responses.append((status, headers or {}, body, delay))
+
+
+@pytest.fixture
+def telegram_stub(monkeypatch):
+    """StubTelegram that the synchronous webhook's requests are sent to"""
+    httpx = pytest.importorskip("httpx")
+    from personal_dashboard import telegram_webhook
+
+    stub = StubTelegram()
+    thread = threading.Thread(target=stub.server.serve_forever, daemon=True)
+    thread.start()
+
+    client = httpx.Client(timeout=httpx.Timeout(2, read=0.2))
+    monkeypatch.setattr(telegram_webhook, "TELEGRAM_API_URL", stub.url)
+    monkeypatch.setattr(telegram_webhook, "_client", client)
+    monkeypatch.setattr(telegram_webhook, "RETRY_BACKOFF", 0.01)
+    yield stub
+
+    client.close()
+    stub.server.shutdown()
+    stub.server.server_close()
@@ -0,0 +1,97 @@
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+from benchmarks.synthetic import generate_transactions  # noqa: E402
+from personal_dashboard.backend.analytics_service import AnalyticsService  # noqa: E402
+from personal_dashboard.backend.database import YONDER_DTYPES  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def transactions() -> pd.DataFrame:
+    return generate_transactions(2000, seed=1).astype(YONDER_DTYPES)
+
+
+def test_view_serves_the_selectors_and_periods(transactions):
+    view = AnalyticsService(transactions, version=("v", 1)).view(exclude_holiday=True)
+    month = transactions.index[-1].to_period("M") - 1
+    year = month.start_time.year
+
+    assert view.version == ("v", 1)
+    assert view.get_available_years() == sorted(set(transactions.index.year))
+    assert month.month in view.get_available_months(year)
+    weeks = view.get_available_weeks(year, month.month)
+    assert weeks and all(week.weekday() == 0 for week in weeks)
+
+    month_df = view.get_period_df(month.start_time, "M")
+    assert not (month_df["category"] == "Holiday").any()
+    assert len(month_df) == len(
+        transactions.loc[str(month)].query("category != 'Holiday'")
+    )
+    assert view.get_stats(month.start_time, "M").total_expense == pytest.approx(
+        month_df["amount_gbp"].sum()
+    )
+    assert view.get_category_totals(month.start_time, "M").sum() == pytest.approx(
+        month_df["amount_gbp"].sum()
+    )
+
+
+def test_regrouped_weeks_match_the_database_rollups(transactions, database_url):
+    psycopg = pytest.importorskip("psycopg")
+    from benchmarks.synthetic import to_yonder_rows
+    from personal_dashboard.backend.database import (
+        SqlConnections,
+        parse_transaction_rows,
+    )
+
+    with psycopg.connect(database_url) as conn:
+        SqlConnections.bulk_upsert_transactions(
+            conn, parse_transaction_rows(to_yonder_rows(transactions))
+        )
+        database_weeks = SqlConnections.get_period_rollups(conn, "week")
+    memory_weeks = AnalyticsService(transactions).view(False).period_rollups["week"]
+
+    # A week from Monday 00:00 to Sunday 23:59, whatever weekday the history ends
+    week = memory_weeks.index[len(memory_weeks) // 2]
+    assert week.weekday() == 0
+    assert list(memory_weeks.index) == list(database_weeks.index)
+    assert memory_weeks.loc[week].to_dict() == pytest.approx(
+        database_weeks.loc[week].to_dict()
+    )
+
+
+def test_precomputed_views_match_views_computed_on_demand(transactions):
+    from personal_dashboard.backend.period_precompute import precompute_period_views
+
+    view = AnalyticsService(transactions).view(exclude_holiday=False)
+    precomputed = precompute_period_views(transactions)
+    month = transactions.index[-1].to_period("M") - 2
+
+    on_demand = view.get_period_view(month.start_time, "M").stats
+    assert precomputed["M", month].stats.total_expense == pytest.approx(
+        on_demand.total_expense
+    )
+    assert precomputed["M", month].stats.average_expense == pytest.approx(
+        on_demand.average_expense
+    )
+    assert precompute_period_views(transactions.iloc[:0]) == {}
+
+
+def test_precompute_in_worker_processes_matches_in_thread(transactions):
+    from personal_dashboard.backend.period_precompute import precompute_period_views
+
+    in_thread = precompute_period_views(transactions, max_workers=1)
+    in_workers = precompute_period_views(
+        transactions, max_workers=2, min_rows_per_worker=1
+    )
+
+    assert in_workers.keys() == in_thread.keys()
+    for key, view in in_thread.items():
+        stats = in_workers[key].stats
+        assert stats.total_expense == pytest.approx(view.stats.total_expense)
+        assert stats.average_expense == pytest.approx(
+            view.stats.average_expense, nan_ok=True
+        )
+        assert stats.diff_between_two_periods == pytest.approx(
+            view.stats.diff_between_two_periods
+        )
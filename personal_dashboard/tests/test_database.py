@@ -0,0 +1,73 @@
+import threading
+
+import pytest
+
+psycopg = pytest.importorskip("psycopg")
+
+from personal_dashboard.backend.database import (  # noqa: E402
+    YONDER,
+    YONDER_ROLLUPS,
+    SqlConnections,
+)
+
+
+def row(time: str, description: str, amount: float) -> tuple:
+    return (time, description, amount, amount, "GBP", "Groceries", "Debit", "")
+
+
+def test_concurrent_ingests_into_one_week_keep_rollups_exact(database_url):
+    # Monday 1 to Sunday 7 January 2024, every ingest touches the same rollups
+    uploads = [
+        [
+            row(f"2024-01-0{day} 1{worker}:00:00", f"shop {worker}", 5.0 * (worker + 1))
+            for day in range(1, 8)
+        ]
+        for worker in range(4)
+    ]
+    barrier = threading.Barrier(len(uploads))
+    errors = []
+
+    def ingest(rows):
+        try:
+            with psycopg.connect(database_url) as conn:
+                barrier.wait()
+                SqlConnections.bulk_upsert_transactions(conn, rows)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=ingest, args=(rows,)) for rows in uploads]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+
+    with psycopg.connect(database_url) as conn:
+        rollups = conn.execute(
+            f"""SELECT period, sum(total), sum(transaction_count), max(max_amount)
+            FROM {YONDER_ROLLUPS} GROUP BY period ORDER BY period"""
+        ).fetchall()
+        totals = conn.execute(
+            f"SELECT sum(amount_gbp), count(*), max(amount_gbp) FROM {YONDER}"
+        ).fetchone()
+
+    assert totals == (7 * (5 + 10 + 15 + 20), 28, 20.0)
+    assert rollups == [(period, *totals) for period in ("day", "month", "week")]
+    with psycopg.connect(database_url) as conn:
+        (weeks,) = conn.execute(
+            f"SELECT count(*) FROM {YONDER_ROLLUPS} WHERE period = 'week'"
+        ).fetchone()
+    assert weeks == 1
+
+
+def test_reupload_does_not_count_twice(database_url):
+    # Identical rows within one upload are both kept
+    rows = [row("2024-01-01 10:00:00", "shop", 5.0)] * 2
+    with psycopg.connect(database_url) as conn:
+        assert SqlConnections.bulk_upsert_transactions(conn, rows) == (2, 0)
+        assert SqlConnections.bulk_upsert_transactions(conn, rows) == (0, 2)
+        rollup = conn.execute(
+            f"SELECT total, transaction_count FROM {YONDER_ROLLUPS} WHERE period = 'week'"
+        ).fetchone()
+
+    assert rollup == (10.0, 2)
@@ -0,0 +1,18 @@
+import pytest
+
+pd = pytest.importorskip("pandas")
+pytest.importorskip("plotly")
+pytest.importorskip("streamlit")
+
+from personal_dashboard.frontend.figures import Figures  # noqa: E402
+
+
+def test_monthly_bars_of_different_years_are_not_merged():
+    months = pd.date_range("2021-01-01", periods=36, freq="MS", name="transaction_time")
+    df = pd.DataFrame({"Groceries": 1.0, "Transport": 2.0}, index=months)
+
+    fig = Figures.category_spending_over_time_figure(df, "Month")
+
+    x = list(fig.data[0].x)
+    assert len(set(x)) == len(months)
+    assert x[0] == "Jan 2021" and x[12] == "Jan 2022"
@@ -0,0 +1,134 @@
+import csv
+import io
+import zipfile
+
+import pytest
+
+pytest.importorskip("psycopg")
+
+from personal_dashboard.backend.importers import (  # noqa: E402
+    MonzoParser,
+    StarlingParser,
+    UnknownLayoutError,
+    YonderParser,
+    detect_parser,
+    parse_rows,
+    parse_statements,
+)
+
+YONDER = (
+    "Date/Time of transaction,Description,Amount (GBP),Amount (in Charged Currency),"
+    "Currency,Category,Debit or Credit,Postcode\r\n"
+    "2024-01-01 10:00:00,Tesco,5.00,5.00,GBP,Groceries,Debit,SW1A 1AA\r\n"
+    "2024-01-02 12:30:00,Cafe de Paris,9.00,10.50,EUR,Eating Out,Debit,\r\n"
+)
+MONZO = (
+    "Transaction ID,Date,Time,Type,Name,Emoji,Category,Amount,Currency,"
+    "Local amount,Local currency\r\n"
+    "tx_1,01/01/2024,10:00:00,Card payment,Tesco,,groceries,-5.00,GBP,-5.00,GBP\r\n"
+    "tx_2,02/01/2024,12:30:00,Faster payment,Salary,,income,2000.00,GBP,2000.00,GBP\r\n"
+)
+STARLING = (
+    "Date,Counter Party,Reference,Type,Amount (GBP),Balance (GBP),"
+    "Spending Category,Notes\r\n"
+    "01/01/2024,Tesco,,CARD,-5.00,95.00,GROCERIES,\r\n"
+    "01/01/2024,Pret,,CARD,-3.50,91.50,EATING_OUT,\r\n"
+)
+YONDER_ROWS = [
+    (
+        "2024-01-01 10:00:00",
+        "Tesco",
+        5.0,
+        5.0,
+        "GBP",
+        "Groceries",
+        "Debit",
+        "SW1A 1AA",
+    ),
+    (
+        "2024-01-02 12:30:00",
+        "Cafe de Paris",
+        9.0,
+        10.5,
+        "EUR",
+        "Eating Out",
+        "Debit",
+        "",
+    ),
+]
+
+
+def parse(text: str) -> list[tuple]:
+    return list(parse_rows(csv.reader(io.StringIO(text, newline=""))))
+
+
+@pytest.mark.parametrize(
+    "statement, parser",
+    [(YONDER, YonderParser), (MONZO, MonzoParser), (STARLING, StarlingParser)],
+)
+def test_detect_parser_recognises_each_layout(statement, parser):
+    header = next(csv.reader(io.StringIO(statement)))
+
+    assert isinstance(detect_parser(header), parser)
+
+
+def test_parse_rows_yonder():
+    assert parse(YONDER) == YONDER_ROWS
+
+
+def test_parse_rows_monzo():
+    assert parse(MONZO) == [
+        ("2024-01-01 10:00:00", "Tesco", 5.0, 5.0, "GBP", "Groceries", "Debit", ""),
+        (
+            "2024-01-02 12:30:00",
+            "Salary",
+            2000.0,
+            2000.0,
+            "GBP",
+            "Income",
+            "Credit",
+            "",
+        ),
+    ]
+
+
+def test_parse_rows_starling_spreads_rows_of_the_same_day():
+    assert parse(STARLING) == [
+        ("2024-01-01 00:00:00", "Tesco", 5.0, 5.0, "GBP", "Groceries", "Debit", ""),
+        ("2024-01-01 00:00:01", "Pret", 3.5, 3.5, "GBP", "Eating Out", "Debit", ""),
+    ]
+
+
+def test_parse_rows_ignores_byte_order_mark_and_padded_header():
+    padded = YONDER.replace(",", " , ", 7)
+
+    assert parse("\ufeff" + YONDER) == YONDER_ROWS
+    assert parse(padded) == YONDER_ROWS
+
+
+def test_parse_rows_reads_unknown_eight_column_header_as_yonder():
+    _, _, body = YONDER.partition("\r\n")
+
+    assert parse("a,b,c,d,e,f,g,h\r\n" + body) == YONDER_ROWS
+
+
+def test_parse_rows_rejects_unknown_layout():
+    with pytest.raises(UnknownLayoutError):
+        parse("Posted,Payee,Value\r\n01/01/2024,Tesco,-5.00\r\n")
+
+
+def test_parse_statements_expands_zip_archives():
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("yonder.csv", "\ufeff" + YONDER)
+        zf.writestr("starling.csv", STARLING)
+        zf.writestr("notes.txt", "not a statement")
+
+    batch = parse_statements([("statements.zip", archive.getvalue())], max_workers=1)
+
+    assert sorted(batch.columns["description"]) == [
+        "Cafe de Paris",
+        "Pret",
+        "Tesco",
+        "Tesco",
+    ]
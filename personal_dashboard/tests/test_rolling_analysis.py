@@ -0,0 +1,78 @@
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+from personal_dashboard.backend.financial_analysis import SpendingAnalysis  # noqa: E402
+from personal_dashboard.backend.rolling_analysis import RollingSpending  # noqa: E402
+
+# Spending per day and category, 2023-01-02 and 2024-01-01 are Mondays
+DAILY = pd.DataFrame(
+    {"Groceries": [10.0, 0.0, 5.10, 20.0, 1.0], "Transport": [0.0, 2.5, 0.0, 4.0, 0.0]},
+    index=pd.to_datetime(
+        ["2023-01-02", "2023-01-03", "2024-01-01", "2024-01-08", "2024-01-10"]
+    ),
+)
+
+
+@pytest.fixture
+def rolling():
+    return RollingSpending(DAILY)
+
+
+def test_total_and_rolling_total(rolling):
+    assert rolling.total(pd.Timestamp("2024-01-01"), pd.Timestamp("2024-01-10")) == (
+        pytest.approx(30.1)
+    )
+    assert rolling.total(
+        pd.Timestamp("2024-01-01"), pd.Timestamp("2024-01-10"), "Groceries"
+    ) == pytest.approx(26.1)
+    assert (
+        rolling.total(pd.Timestamp("2024-01-01"), pd.Timestamp("2024-01-10"), "Rent")
+        == 0
+    )
+    # Days 2024-01-04 to 2024-01-10
+    assert rolling.rolling_total(pd.Timestamp("2024-01-10"), 7) == pytest.approx(25.0)
+    assert rolling.moving_average(pd.Timestamp("2024-01-10"), 10) == pytest.approx(3.01)
+
+
+def test_get_rolling_stats(rolling):
+    stats = rolling.get_rolling_stats(pd.Timestamp("2024-01-10"), window_days=7)
+
+    assert stats.moving_average == pytest.approx(25.0 / 7)
+    # 2023-12-28 to 2024-01-03 only holds 2024-01-01
+    assert stats.moving_average_change == pytest.approx((25.0 - 5.1) / 7)
+    assert stats.year_to_date == pytest.approx(30.1)
+    # Against 2023-01-01 to 2023-01-10
+    assert stats.year_to_date_change == pytest.approx(30.1 - 12.5)
+
+
+def test_get_stats_compares_with_the_week_before():
+    transactions = pd.DataFrame(
+        {
+            "description": ["Tesco", "Bus", "Tesco", "Pret"],
+            "amount_gbp": [5.1, 2.0, 20.0, 4.0],
+            "category": ["Groceries", "Transport", "Groceries", "Eating Out"],
+            "debit_or_credit": "Debit",
+        },
+        index=pd.to_datetime(
+            [
+                "2024-01-01 09:00",
+                "2024-01-07 18:00",
+                "2024-01-08 09:00",
+                "2024-01-10 12:00",
+            ]
+        ),
+    )
+    week = pd.Period("2024-01-08", "W")
+    totals = pd.Series(
+        [7.1, 24.0], index=pd.period_range("2024-01-01", periods=2, freq="W")
+    )
+
+    stats = SpendingAnalysis.get_stats(
+        transactions.loc[week.start_time : week.end_time], totals, week
+    )
+
+    assert stats.total_expense == pytest.approx(24.0)
+    assert stats.diff_between_two_periods == pytest.approx(24.0 - 7.1)
+    assert stats.top_expense_amount == pytest.approx(20.0)
+    assert stats.top_expense_description == "Tesco"
@@ -0,0 +1,86 @@
+import time
+
+import pytest
+
+httpx = pytest.importorskip("httpx")
+pytest.importorskip("functions_framework")
+
+from personal_dashboard import telegram_webhook  # noqa: E402
+from personal_dashboard.telegram_webhook import (  # noqa: E402
+    get_file_path,
+    iter_lines,
+    send_msg,
+    stream_csv_rows,
+)
+
+STATEMENT = (
+    "Date/Time of transaction,Description,Amount (GBP)\r\n"
+    '2024-01-01 10:00:00,"Tesco\nExtra Store",5.00\r\n'
+    "2024-01-02 10:00:00,Pret\u2028A Manger,3.50\r\n"
+)
+ROWS = [
+    ["Date/Time of transaction", "Description", "Amount (GBP)"],
+    ["2024-01-01 10:00:00", "Tesco\nExtra Store", "5.00"],
+    ["2024-01-02 10:00:00", "Pret\u2028A Manger", "3.50"],
+]
+
+
+def test_iter_lines_keeps_line_breaks_across_chunks():
+    chunks = [STATEMENT[i : i + 7] for i in range(0, len(STATEMENT), 7)]
+
+    assert "".join(iter_lines(chunks)) == STATEMENT
+    assert list(iter_lines(["a\nb", "c\r\nd"])) == ["a\n", "bc\r\n", "d"]
+
+
+def test_stream_csv_rows_keeps_newlines_inside_quoted_fields(telegram_stub):
+    telegram_stub.respond(body=STATEMENT)
+
+    rows = list(stream_csv_rows(f"{telegram_stub.url}/file/statement.csv"))
+
+    assert rows == ROWS
+
+
+def test_retry_after_is_capped(telegram_stub, monkeypatch):
+    monkeypatch.setattr(telegram_webhook, "MAX_RETRY_DELAY", 0.05)
+    telegram_stub.respond(429, '{"ok": false, "parameters": {"retry_after": 600}}')
+    telegram_stub.respond(503, headers={"Retry-After": "600"})
+    telegram_stub.respond(200, '{"ok": true, "result": {"file_path": "a.csv"}}')
+
+    start = time.perf_counter()
+    assert get_file_path("file") == "a.csv"
+
+    assert time.perf_counter() - start < 1
+    assert len(telegram_stub.requests) == 3
+
+
+def test_idempotent_request_is_retried_after_read_timeout(telegram_stub):
+    telegram_stub.respond(200, '{"ok": true}', delay=0.5)
+    telegram_stub.respond(200, '{"ok": true, "result": {"file_path": "a.csv"}}')
+
+    assert get_file_path("file") == "a.csv"
+    assert len(telegram_stub.requests) == 2
+
+
+def test_send_msg_is_not_resent_after_read_timeout(telegram_stub):
+    telegram_stub.respond(200, '{"ok": true}', delay=0.5)
+
+    with pytest.raises(httpx.ReadTimeout):
+        send_msg(42, "hello")
+    assert len(telegram_stub.requests) == 1
+
+
+def test_send_msg_is_retried_when_it_could_not_connect(telegram_stub, monkeypatch):
+    attempts = []
+    request = telegram_webhook.get_client().request
+
+    def refuse_first(*args, **kwargs):
+        attempts.append(args)
+        if len(attempts) == 1:
+            raise httpx.ConnectError("connection refused")
+        return request(*args, **kwargs)
+
+    monkeypatch.setattr(telegram_webhook.get_client(), "request", refuse_first)
+
+    send_msg(42, "hello")
+    assert len(attempts) == 2
+    assert len(telegram_stub.requests) == 1
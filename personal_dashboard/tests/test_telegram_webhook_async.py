@@ -0,0 +1,35 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("functions_framework")
+
+from personal_dashboard import telegram_webhook_async  # noqa: E402
+from personal_dashboard.telegram_webhook_async import (  # noqa: E402
+    IngestJob,
+    IngestWorker,
+)
+
+
+def drain(worker: IngestWorker, job: IngestJob):
+    assert worker.submit(job)
+    asyncio.run_coroutine_threadsafe(worker._queue.join(), worker._loop).result(5)
+
+
+def test_already_ingested_document_gets_a_reply(telegram_stub, monkeypatch):
+    monkeypatch.setattr(telegram_webhook_async, "is_file_ingested", lambda _: True)
+    job = IngestJob(
+        update_id=1,
+        chat_id=42,
+        file_id="file",
+        file_unique_id="unique",
+        file_name="statement.csv",
+        mime_type="text/csv",
+    )
+
+    drain(IngestWorker(workers=1).start(), job)
+
+    assert job.metrics.status == "duplicate"
+    [(_, path)] = telegram_stub.requests
+    assert "/sendMessage?" in path
+    assert "statement.csv+was+already+processed" in path
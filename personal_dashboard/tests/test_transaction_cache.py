@@ -0,0 +1,65 @@
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+pytest.importorskip("pyarrow")
+
+from benchmarks.synthetic import generate_transactions  # noqa: E402
+from personal_dashboard.backend import transaction_cache  # noqa: E402
+from personal_dashboard.backend.database import YONDER_DTYPES  # noqa: E402
+from personal_dashboard.backend.transaction_cache import TransactionCache  # noqa: E402
+from personal_dashboard.backend.transaction_snapshot import (  # noqa: E402
+    TransactionSnapshot,
+)
+
+
+class StubDatabase:
+    """Stands in for SqlConnections, answering only once released"""
+
+    def __init__(self, df: pd.DataFrame):
+        self.df = df
+        self.released = threading.Event()
+        self.connections = 0
+
+    @contextmanager
+    def connection(self):
+        self.connections += 1
+        assert self.released.wait(5)
+        yield None
+
+    def get_transactions_watermark(self, conn):
+        return self.df.index[-1].to_pydatetime(), len(self.df)
+
+    def get_transactions_since(self, conn, watermark: datetime):
+        return self.df.loc[self.df.index > watermark]
+
+    def get_all_transactions_as_table(self, conn):
+        return self.df
+
+
+def test_first_get_reads_the_snapshot_and_refreshes_in_background(
+    tmp_path, monkeypatch
+):
+    df = generate_transactions(100, seed=2).astype(YONDER_DTYPES)
+    snapshot = TransactionSnapshot(str(tmp_path / "transactions.parquet"))
+    snapshot.write(df.iloc[:90], df.index[89].to_pydatetime(), 90)
+    database = StubDatabase(df)
+    monkeypatch.setattr(transaction_cache, "SqlConnections", database)
+
+    cache = TransactionCache(snapshot=snapshot)
+    first, version = cache.get_with_version()
+
+    # Served from disk while the database has not answered yet
+    assert len(first) == 90
+    assert version == (df.index[89].to_pydatetime(), 90)
+
+    database.released.set()
+    cache._reconciler.join(5)
+    refreshed, version = cache.get_with_version()
+    assert len(refreshed) == 100
+    assert version == (df.index[-1].to_pydatetime(), 100)
+    assert snapshot.load()[2] == 100
+    assert database.connections == 1